@@ -4,6 +4,7 @@ from fastapi.security import OAuth2PasswordBearer
 from database import get_db
 from models import User
 from jose import JWTError, jwt
+from utils.token_cache import Principal, token_cache
 
 # Replace with your actual secret key and algorithm
 SECRET_KEY = "your_secret_key"
@@ -11,10 +12,15 @@ ALGORITHM = "HS256"
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_current_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     """
-    Dependency to get the current authenticated user from the JWT token.
+    Dependency to get the authenticated caller as a lightweight Principal.
+    Verified tokens are cached briefly, so repeat requests skip the JWT decode and user query.
     """
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+
     try:
         # Decode the token
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -33,11 +39,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         )
 
     # Query the user
-    user = db.query(User).filter(User.username == user_id).first()
+    user = db.query(User.id, User.username, User.is_admin).filter(User.username == user_id).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
 
-    return user
+    principal = Principal(id=user.id, username=user.username, is_admin=bool(user.is_admin))
+    token_cache.put(token, principal, token_exp=payload.get("exp"))
+    return principal
@@ -1,17 +1,30 @@
 # Standard Library Imports
 import os
+from contextlib import asynccontextmanager
 
 # Third-Party Library Imports
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 
 # Application Imports
-from database import Base, engine
-from models import User, Quiz, Report  # Import models to ensure tables are created
+from database import engine, async_engine
 from routes import user_routes, quiz_routes, report_routes
+from utils.metrics import MetricsMiddleware, METRICS_CONTENT_TYPE, instrument_engine, metrics
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.search import SEARCH_TRUNCATED_HEADER
+from utils.startup import initialize_once
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables, migrations and the admin user; runs once across workers, see utils/startup.py
+    await run_in_threadpool(initialize_once)
+    yield
+
 
 # Application Initialization
-Base.metadata.create_all(bind=engine)  # Initialize database tables
 root_path = os.getenv("ROOT_PATH", "/api")  # Default to "/" if ROOT_PATH is not set
 app = FastAPI(
     title="StudyBuddy API",
@@ -19,11 +32,11 @@ app = FastAPI(
     version="1.0.0",
     root_path=root_path,
     docs_url=f"{root_path}docs",  # Swagger UI
-    openapi_url=f"{root_path}openapi.json"  # OpenAPI schema
+    openapi_url=f"{root_path}openapi.json",  # OpenAPI schema
+    default_response_class=ORJSONResponse,  # orjson encoding for every route
+    lifespan=lifespan,
 )
 
-User.create_admin()  # Ensure admin user exists
-
 # CORS Middleware
 origins = [
     "http://localhost",  # Frontend running on default port 80
@@ -39,13 +52,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, SEARCH_TRUNCATED_HEADER],  # Let browsers read pagination and search headers
 )
 
+# Metrics Middleware (added last so it is outermost and also times CORS handling)
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+app.add_middleware(MetricsMiddleware)
+
 # Add Routers
 app.include_router(user_routes.router, prefix="/users", tags=["Users"])
 app.include_router(quiz_routes.router, prefix="/quizzes", tags=["Quizzes"])
 app.include_router(report_routes.router, prefix="/reports", tags=["Reports"])
 
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint for this worker, see utils/metrics.py."""
+    return Response(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 # Debug or initialization hooks (if any)
 
 if __name__ == "__main__":
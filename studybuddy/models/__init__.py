@@ -3,6 +3,13 @@
 from .user import User
 from .quiz import Quiz
 from .report import Report
+from .deck import QuestionDeck
+from .question import Question
+from .user_stats import UserStats
+from .score_bucket import ScoreBucket
+from .question_mastery import QuestionMastery
+from .quiz_analytics import QuizAnalytics
+from .schema_info import SchemaInfo
 
-__all__ = ["User", "Quiz", "Report"]
+__all__ = ["User", "Quiz", "Report", "QuestionDeck", "Question", "UserStats", "ScoreBucket", "QuestionMastery", "QuizAnalytics", "SchemaInfo"]
 
@@ -0,0 +1,39 @@
+import struct
+from sqlalchemy import Column, Integer, ForeignKey, LargeBinary, func
+from sqlalchemy.orm import relationship, Session
+from database import Base
+
+
+class QuestionDeck(Base):
+    """
+    The shuffled question order of a quiz session.
+
+    Kept out of the reports table so advancing the cursor on a report never
+    rewrites the deck, and stored as packed little-endian uint32 indices so a
+    single position can be read with substr() without decoding the rest.
+    """
+    __tablename__ = "question_decks"
+    __table_args__ = {"extend_existing": True}
+
+    ITEM_SIZE = 4
+
+    report_id = Column(Integer, ForeignKey("reports.id"), primary_key=True)
+    question_order = Column(LargeBinary, nullable=False)  # Packed question indices
+
+    # Relationships
+    report = relationship("Report", back_populates="deck")
+
+    @classmethod
+    def pack(cls, question_order: list) -> bytes:
+        """Pack a list of question indices into the stored binary form."""
+        return struct.pack(f"<{len(question_order)}I", *question_order)
+
+    @classmethod
+    def get_index(cls, db: Session, report_id: int, position: int) -> int:
+        """Read the question index at a single deck position."""
+        chunk = (
+            db.query(func.substr(cls.question_order, position * cls.ITEM_SIZE + 1, cls.ITEM_SIZE))
+            .filter(cls.report_id == report_id)
+            .scalar()
+        )
+        return struct.unpack("<I", chunk)[0]
@@ -0,0 +1,105 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, JSON, select, update, bindparam
+from sqlalchemy.orm import relationship, Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Base
+from utils.answer_matching import accepted_answers
+
+
+class Question(Base):
+    __tablename__ = "questions"
+    __table_args__ = (
+        Index("ix_questions_quiz_ordinal", "quiz_id", "ordinal", unique=True),
+        Index("ix_questions_quiz_prompt", "quiz_id", "prompt", unique=True),
+        {"extend_existing": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    ordinal = Column(Integer, nullable=False)  # Position of the question within its quiz
+    prompt = Column(String, nullable=False)  # Question text shown to the user
+    answer = Column(String, nullable=False)  # Expected answer
+    accepted_answers = Column(JSON, nullable=True)  # Normalized alternatives of the answer, set at upload
+    attempt_count = Column(Integer, default=0, nullable=False)  # Answers logged, all users
+    miss_count = Column(Integer, default=0, nullable=False)  # Wrong answers logged, all users
+
+    # Relationships
+    quiz = relationship("Quiz", back_populates="questions")
+
+    @classmethod
+    def get_by_ordinal(cls, db: Session, quiz_id: int, ordinal: int):
+        """Fetch a single question by its position in the quiz."""
+        return db.query(cls).filter(cls.quiz_id == quiz_id, cls.ordinal == ordinal).first()
+
+    @classmethod
+    def get_by_prompt(cls, db: Session, quiz_id: int, prompt: str):
+        """Fetch a single question by its text."""
+        return db.query(cls).filter(cls.quiz_id == quiz_id, cls.prompt == prompt).first()
+
+    @classmethod
+    def record_results(cls, db: Session, results: list):
+        """
+        Count (question_id, correct) answer results with atomic increments,
+        one parameter set per distinct question in a single executemany. The caller commits.
+        """
+        counts = {}
+        for question_id, correct in results:
+            attempts, misses = counts.get(question_id, (0, 0))
+            counts[question_id] = (attempts + 1, misses + (0 if correct else 1))
+        if not counts:
+            return
+        table = cls.__table__
+        db.execute(
+            update(table)
+            .where(table.c.id == bindparam("question_id"))
+            .values(
+                attempt_count=table.c.attempt_count + bindparam("attempts"),
+                miss_count=table.c.miss_count + bindparam("misses"),
+            ),
+            [
+                {"question_id": question_id, "attempts": attempts, "misses": misses}
+                for question_id, (attempts, misses) in counts.items()
+            ],
+        )
+
+    @classmethod
+    def get_ids_by_ordinal(cls, db: Session, quiz_id: int, ordinals: list) -> dict:
+        """Map question positions of a quiz to question ids."""
+        rows = db.query(cls.ordinal, cls.id).filter(cls.quiz_id == quiz_id, cls.ordinal.in_(ordinals)).all()
+        return dict(rows)
+
+    def get_accepted_answers(self) -> list:
+        """Return the normalized accepted answers, computing them for rows stored before they existed."""
+        return self.accepted_answers or accepted_answers(self.answer)
+
+    @classmethod
+    def get_answer_rows(cls, db: Session, quiz_id: int) -> list:
+        """Fetch (prompt, answer, accepted_answers) of every question of a quiz, in ordinal order."""
+        return (
+            db.query(cls.prompt, cls.answer, cls.accepted_answers)
+            .filter(cls.quiz_id == quiz_id)
+            .order_by(cls.ordinal)
+            .all()
+        )
+
+    @classmethod
+    def get_answer_map(cls, db: Session, quiz_id: int) -> dict:
+        """Fetch every prompt -> answer pair of a quiz, in ordinal order."""
+        rows = (
+            db.query(cls.prompt, cls.answer)
+            .filter(cls.quiz_id == quiz_id)
+            .order_by(cls.ordinal)
+            .all()
+        )
+        return {prompt: answer for prompt, answer in rows}
+
+    @classmethod
+    async def get_by_ordinal_async(cls, db: AsyncSession, quiz_id: int, ordinal: int):
+        """Fetch a single question by its position in the quiz."""
+        result = await db.execute(select(cls).filter(cls.quiz_id == quiz_id, cls.ordinal == ordinal))
+        return result.scalars().first()
+
+    @classmethod
+    async def get_by_prompt_async(cls, db: AsyncSession, quiz_id: int, prompt: str):
+        """Fetch a single question by its text."""
+        result = await db.execute(select(cls).filter(cls.quiz_id == quiz_id, cls.prompt == prompt))
+        return result.scalars().first()
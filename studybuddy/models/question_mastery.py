@@ -0,0 +1,137 @@
+import heapq
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, case, literal, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import Base
+
+# Leitner-style schedule: after n correct answers in a row a question is due
+# again after REVIEW_INTERVALS[n - 1] (the last interval repeats). A wrong
+# answer resets the streak and makes the question due immediately.
+REVIEW_INTERVALS = [
+    timedelta(days=1),
+    timedelta(days=3),
+    timedelta(days=7),
+    timedelta(days=16),
+    timedelta(days=35),
+]
+
+
+class QuestionMastery(Base):
+    """
+    How well a user knows each question they have answered, updated with every answer.
+    A user has at most one row per question, so review decks cost the same however
+    many reports they have.
+    """
+    __tablename__ = "question_mastery"
+    __table_args__ = (
+        # Due questions of one user in one quiz
+        Index("ix_question_mastery_user_quiz_due", "user_id", "quiz_id", "next_due"),
+        {"extend_existing": True},
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
+    correct_count = Column(Integer, default=0, nullable=False)
+    incorrect_count = Column(Integer, default=0, nullable=False)
+    streak = Column(Integer, default=0, nullable=False)  # Correct answers in a row
+    last_seen = Column(DateTime, nullable=False)
+    next_due = Column(DateTime, nullable=False)
+
+    @staticmethod
+    def due_after(seen_on: datetime, streak: int) -> datetime:
+        """When a question answered correctly `streak` times in a row is due again."""
+        return seen_on + REVIEW_INTERVALS[min(streak, len(REVIEW_INTERVALS)) - 1]
+
+    @classmethod
+    def record_answer(
+        cls, db: Session, user_id: int, quiz_id: int, question_id: int, correct: bool, seen_on: datetime = None
+    ):
+        """
+        Fold one answer into the user's mastery of a question with a single atomic UPDATE,
+        creating the row on first sight. The caller commits.
+        """
+        seen_on = seen_on or datetime.utcnow()
+        if correct:
+            values = {
+                "correct_count": cls.correct_count + 1,
+                "streak": cls.streak + 1,
+                # The new streak is the old one plus one; pick its interval in SQL
+                "next_due": case(
+                    *[
+                        (cls.streak == streak - 1, literal(cls.due_after(seen_on, streak), DateTime))
+                        for streak in range(1, len(REVIEW_INTERVALS))
+                    ],
+                    else_=literal(cls.due_after(seen_on, len(REVIEW_INTERVALS)), DateTime),
+                ),
+            }
+        else:
+            values = {"incorrect_count": cls.incorrect_count + 1, "streak": 0, "next_due": seen_on}
+        values["last_seen"] = seen_on
+
+        increment = (
+            update(cls)
+            .where(cls.user_id == user_id, cls.question_id == question_id)
+            .values(**values)
+        )
+        if db.execute(increment, execution_options={"synchronize_session": False}).rowcount:
+            return
+        try:
+            with db.begin_nested():
+                db.add(cls(
+                    user_id=user_id,
+                    question_id=question_id,
+                    quiz_id=quiz_id,
+                    correct_count=1 if correct else 0,
+                    incorrect_count=0 if correct else 1,
+                    streak=1 if correct else 0,
+                    last_seen=seen_on,
+                    next_due=cls.due_after(seen_on, 1) if correct else seen_on,
+                ))
+        except IntegrityError:
+            # Another request created the row first
+            db.execute(increment, execution_options={"synchronize_session": False})
+
+    @classmethod
+    def record_answers(cls, db: Session, user_id: int, quiz_id: int, answers: list):
+        """Record several (question_id, correct, seen_on) answers. The caller commits."""
+        for question_id, correct, seen_on in answers:
+            cls.record_answer(db, user_id, quiz_id, question_id, correct, seen_on)
+
+    @staticmethod
+    def weakness(correct_count: int, incorrect_count: int, next_due: datetime, now: datetime) -> float:
+        """
+        Sampling weight of a due question: its smoothed miss rate, growing with
+        every day it is overdue.
+        """
+        miss_rate = (incorrect_count + 1) / (correct_count + incorrect_count + 2)
+        days_overdue = max((now - next_due).total_seconds(), 0) / 86400
+        return miss_rate * (1 + days_overdue)
+
+    @classmethod
+    def review_order(cls, db: Session, user_id: int, quiz_id: int, size: int = None, now: datetime = None) -> list:
+        """
+        Build a review deck: ordinals of the user's due questions in a random order
+        weighted by weakness, at most `size` of them.
+
+        Uses Efraimidis-Spirakis weighted sampling without replacement: each candidate
+        draws an exponential key with its weight as rate and the smallest keys win.
+        That is one pass and a size-bounded heap, O(n log size) over at most one row
+        per question of the quiz.
+        """
+        from models.question import Question
+
+        now = now or datetime.utcnow()
+        due = (
+            db.query(Question.ordinal, cls.correct_count, cls.incorrect_count, cls.next_due)
+            .join(Question, Question.id == cls.question_id)
+            .filter(cls.user_id == user_id, cls.quiz_id == quiz_id, cls.next_due <= now)
+            .all()
+        )
+        keyed = (
+            (random.expovariate(cls.weakness(correct, incorrect, next_due, now)), ordinal)
+            for ordinal, correct, incorrect, next_due in due
+        )
+        return [ordinal for _, ordinal in heapq.nsmallest(size or len(due), keyed)]
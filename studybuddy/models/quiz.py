@@ -1,8 +1,14 @@
-import json
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float
+import hashlib
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, select, update, case, func
 from datetime import datetime
-from sqlalchemy.orm import relationship, Session
+from sqlalchemy.orm import relationship, Session, object_session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import Base
+from models.question import Question
+from utils.question_cache import question_cache
+from utils.answer_matching import accepted_answers
+from utils.quiz_stats import quiz_stats, QUIZ_STATS_MODE
+from utils.response_cache import response_cache, quiz_key
 
 
 class Quiz(Base):
@@ -11,10 +17,11 @@ class Quiz(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True, nullable=False)  # Quiz name
-    questions = Column(String, nullable=False)  # Store questions as JSON
+    questions_version = Column(String, nullable=True)  # Content hash of questions, used as cache key
     created_on = Column(DateTime, default=datetime.utcnow)  # When the quiz was created
     created_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # Link to User
     total_questions = Column(Integer, default=0)  # Number of questions in the quiz
+    fuzzy_tolerance = Column(Integer, default=0, nullable=False)  # Typos (edits) tolerated in answers
 
     # Statistics
     times_accessed = Column(Integer, default=0)  # Number of times the quiz was started
@@ -25,31 +32,109 @@ class Quiz(Base):
     # Relationships
     creator = relationship("User", back_populates="quizzes")
     reports = relationship("Report", back_populates="quiz", cascade="all, delete-orphan")
+    questions = relationship("Question", back_populates="quiz", cascade="all, delete-orphan", order_by="Question.ordinal")
 
     # Helper methods for questions
+    @staticmethod
+    def hash_question(hasher, prompt: str, answer: str):
+        """Feed one question into a content hash, see compute_version."""
+        hasher.update(f"{prompt}\x1f{answer}\x1e".encode("utf-8"))
+
+    @classmethod
+    def compute_version(cls, questions: dict) -> str:
+        """Hash the questions in order so any content change yields a new version."""
+        hasher = hashlib.sha1()
+        for prompt, answer in questions.items():
+            cls.hash_question(hasher, prompt, answer)
+        return hasher.hexdigest()
+
     def set_questions(self, questions_dict: dict):
-        """Serialize questions into JSON format."""
-        self.questions = json.dumps(questions_dict)
-        self.total_questions = len(questions_dict) 
+        """Store questions as rows of the questions table, numbered by ordinal."""
+        questions_dict = {str(prompt): str(answer) for prompt, answer in questions_dict.items()}
+        self.questions = [
+            Question(ordinal=ordinal, prompt=prompt, answer=answer, accepted_answers=accepted_answers(answer))
+            for ordinal, (prompt, answer) in enumerate(questions_dict.items())
+        ]
+        self.questions_version = self.compute_version(questions_dict)
+        self.total_questions = len(questions_dict)
+
+    def _decoded_questions(self):
+        """Return the full question map, its ordered keys and accepted answers, via the process-wide cache."""
+        decoded = question_cache.get(self.id, self.questions_version)
+        if decoded is None:
+            rows = Question.get_answer_rows(object_session(self), self.id)
+            decoded = question_cache.put(
+                self.id,
+                self.questions_version,
+                {prompt: answer for prompt, answer, _ in rows},
+                {prompt: accepted or accepted_answers(answer) for prompt, answer, accepted in rows},
+            )
+        return decoded
 
     def get_questions(self) -> dict:
-        """Deserialize questions from JSON format."""
-        return json.loads(self.questions)
+        """
+        Fetch the full prompt -> answer map of the quiz.
+        Decoded maps are shared through the process-wide cache, so treat the result as read-only.
+        Single-question lookups should use Question.get_by_prompt / get_by_ordinal instead.
+        """
+        return self._decoded_questions().questions
 
-    def increment_access_count(self):
-        """Increment the times_accessed field."""
-        self.times_accessed += 1
+    def get_accepted_answers(self) -> dict:
+        """Return the prompt -> normalized accepted answers map of the quiz. Read-only, like get_questions."""
+        return self._decoded_questions().accepted
+
+    def get_question_keys(self) -> list:
+        """Return the questions in ordinal order, so a question can be fetched by index."""
+        return self._decoded_questions().keys
 
-    def increment_completion_count(self):
-        """Increment the times_completed field."""
-        self.times_completed += 1
+    # Statistics are maintained with atomic UPDATEs so concurrent workers never lose updates
+    @classmethod
+    def apply_stats_delta(
+        cls,
+        db_session: Session,
+        quiz_id: int,
+        accessed: int = 0,
+        completed: int = 0,
+        score_sum: float = 0.0,
+        best_score: float = None,
+    ):
+        """Apply statistic deltas to a quiz in a single UPDATE statement."""
+        values = {}
+        if accessed:
+            values["times_accessed"] = func.coalesce(cls.times_accessed, 0) + accessed
+        if completed:
+            # Right-hand sides all see the pre-update row, so the old count weights the old average
+            times_completed = func.coalesce(cls.times_completed, 0)
+            average_score = func.coalesce(cls.average_score, 0.0)
+            values["times_completed"] = times_completed + completed
+            values["average_score"] = (average_score * times_completed + score_sum) / (times_completed + completed)
+        if best_score is not None:
+            highest_score = func.coalesce(cls.highest_score, 0.0)
+            values["highest_score"] = case((highest_score < best_score, best_score), else_=highest_score)
+        if not values:
+            return
 
-    def update_statistics(self, new_score: float):
-        """Update highest_score and average_score."""
-        self.highest_score = max(self.highest_score, new_score)
-        if self.times_completed > 0:
-            total_score = (self.average_score * (self.times_completed - 1)) + new_score
-            self.average_score = total_score / self.times_completed
+        db_session.execute(
+            update(cls).where(cls.id == quiz_id).values(**values),
+            execution_options={"synchronize_session": False},
+        )
+        response_cache.invalidate_on_commit(db_session, quiz_key(quiz_id))
+
+    @classmethod
+    def increment_access_count(cls, db_session: Session, quiz_id: int):
+        """Increment the times_accessed field."""
+        if QUIZ_STATS_MODE == "deferred":
+            quiz_stats.record(quiz_id, accessed=1)
+        else:
+            cls.apply_stats_delta(db_session, quiz_id, accessed=1)
+
+    @classmethod
+    def record_completion(cls, db_session: Session, quiz_id: int, score: float):
+        """Increment times_completed and fold the score into highest_score and average_score."""
+        if QUIZ_STATS_MODE == "deferred":
+            quiz_stats.record(quiz_id, completed=1, score=score)
+        else:
+            cls.apply_stats_delta(db_session, quiz_id, completed=1, score_sum=score, best_score=score)
 
     @classmethod
     def get_quiz_by_id(cls, db_session: Session, quiz_id: int):
@@ -70,3 +155,36 @@ class Quiz(Base):
     def get_quizzes_by_user(cls, db_session: Session, user_id: int):
         """Fetch all quizzes created by a specific user."""
         return db_session.query(cls).filter(cls.created_by == user_id).all()
+
+    # Async counterparts for `async def` handlers using get_async_db
+    @classmethod
+    async def get_quiz_by_id_async(cls, db_session: AsyncSession, quiz_id: int):
+        """Fetch a single quiz by ID."""
+        result = await db_session.execute(select(cls).filter(cls.id == quiz_id))
+        return result.scalars().first()
+
+    @classmethod
+    async def get_quiz_by_name_async(cls, db_session: AsyncSession, name: str):
+        """Fetch a single quiz by Name."""
+        result = await db_session.execute(select(cls).filter(cls.name == name))
+        return result.scalars().first()
+
+    @classmethod
+    async def get_all_quizzes_async(cls, db_session: AsyncSession):
+        """Fetch all quizzes."""
+        result = await db_session.execute(select(cls))
+        return result.scalars().all()
+
+    @classmethod
+    async def get_catalogue_async(cls, db_session: AsyncSession):
+        """Fetch the id, name, created_on and total_questions of every quiz, in id order."""
+        result = await db_session.execute(
+            select(cls.id, cls.name, cls.created_on, cls.total_questions).order_by(cls.id)
+        )
+        return result.all()
+
+    @classmethod
+    async def get_quizzes_by_user_async(cls, db_session: AsyncSession, user_id: int):
+        """Fetch all quizzes created by a specific user."""
+        result = await db_session.execute(select(cls).filter(cls.created_by == user_id))
+        return result.scalars().all()
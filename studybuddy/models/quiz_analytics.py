@@ -0,0 +1,114 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, JSON
+from sqlalchemy.orm import Session
+from database import Base
+
+
+class QuizAnalytics(Base):
+    """
+    Snapshot of per-question difficulty analytics for a quiz, rebuilt by utils.analytics.
+    Serving it is a single primary-key read, however many answers the quiz has.
+    """
+    __tablename__ = "quiz_analytics"
+    __table_args__ = {"extend_existing": True}
+
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    computed_on = Column(DateTime, nullable=False)
+    answers_logged = Column(Integer, default=0, nullable=False)
+    questions = Column(JSON, nullable=False)  # One entry per question, hardest first
+
+    @classmethod
+    def get(cls, db: Session, quiz_id: int) -> "QuizAnalytics":
+        """Fetch the stored snapshot of a quiz, or None."""
+        return db.get(cls, quiz_id)
+
+    def age_seconds(self) -> float:
+        return (datetime.utcnow() - self.computed_on).total_seconds()
+
+    @classmethod
+    def rebuild(cls, db: Session, quiz_id: int) -> "QuizAnalytics":
+        """
+        Recompute a quiz's analytics: difficulty from the question counters,
+        discrimination from question_mastery and common wrong answers from the
+        reports' incorrect answers. The caller commits.
+        """
+        import numpy as np
+        from models.question import Question
+        from models.question_mastery import QuestionMastery
+        from models.report import Report
+        from utils.analytics import difficulty, discrimination, common_wrong_answers
+
+        questions = (
+            db.query(Question.id, Question.ordinal, Question.prompt, Question.attempt_count, Question.miss_count)
+            .filter(Question.quiz_id == quiz_id)
+            .order_by(Question.ordinal)
+            .all()
+        )
+        total = len(questions)
+        attempts = np.array([q.attempt_count for q in questions], dtype=np.int64)
+        misses = np.array([q.miss_count for q in questions], dtype=np.int64)
+        miss_rate = difficulty(attempts, misses)
+
+        mastery = (
+            db.query(
+                QuestionMastery.user_id,
+                Question.ordinal,
+                QuestionMastery.correct_count,
+                QuestionMastery.incorrect_count,
+            )
+            .join(Question, Question.id == QuestionMastery.question_id)
+            .filter(QuestionMastery.quiz_id == quiz_id)
+            .all()
+        )
+        if mastery:
+            _, user_index = np.unique(np.array([row[0] for row in mastery]), return_inverse=True)
+            index, respondents = discrimination(
+                user_index,
+                [row[1] for row in mastery],
+                [row[2] for row in mastery],
+                [row[3] for row in mastery],
+                total,
+            )
+        else:
+            index, respondents = np.full(total, np.nan), np.zeros(total, dtype=np.int64)
+
+        wrong_answers = common_wrong_answers(
+            (
+                incorrect_answers
+                for (incorrect_answers,) in db.query(Report.incorrect_answers)
+                .filter(Report.quiz_id == quiz_id, Report.total_incorrect > 0)
+                .yield_per(1000)
+            ),
+            {q.prompt: q.ordinal for q in questions},
+            Report.normalize_answer,
+        )
+
+        def number(value):
+            return None if np.isnan(value) else round(float(value), 4)
+
+        entries = [
+            {
+                "ordinal": q.ordinal,
+                "question": q.prompt,
+                "attempts": int(attempts[i]),
+                "misses": int(misses[i]),
+                "difficulty": number(miss_rate[i]),
+                "discrimination": number(index[i]),
+                "respondents": int(respondents[i]),
+                "common_wrong_answers": [
+                    {"answer": answer, "count": count}
+                    for answer, count in wrong_answers.get(q.ordinal, [])
+                ],
+            }
+            for i, q in enumerate(questions)
+        ]
+        # Hardest first; unanswered questions last
+        entries.sort(key=lambda e: (e["difficulty"] is None, -(e["difficulty"] or 0), e["ordinal"]))
+
+        analytics = cls.get(db, quiz_id) or cls(quiz_id=quiz_id)
+        analytics.computed_on = datetime.utcnow()
+        analytics.answers_logged = int(attempts.sum())
+        analytics.questions = entries
+        db.add(analytics)
+        db.flush()
+        return analytics
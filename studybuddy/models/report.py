@@ -1,15 +1,37 @@
 import random
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, JSON, Index, select, or_, and_, func, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.mutable import MutableList
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import relationship, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import Base
 from models.quiz import Quiz
+from models.deck import QuestionDeck
+from models.question import Question
+from models.user_stats import UserStats
+from models.score_bucket import ScoreBucket
+from models.question_mastery import QuestionMastery
 from fastapi import HTTPException
+from utils.answer_matching import normalize_answer, accepted_answers, answer_matches, display_answer
 
 class Report(Base):
     __tablename__ = "reports"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # Keyset pagination of report history, newest first
+        Index("ix_reports_user_started", "user_id", "started_on", "id"),
+        Index("ix_reports_quiz_started", "quiz_id", "started_on", "id"),
+        # Leaderboards: top scores of a quiz, ties broken by completion time,
+        # read in index order without sorting every attempt
+        Index(
+            "ix_reports_quiz_leaderboard", "quiz_id", text("score DESC"), "completed_on",
+            sqlite_where=text("mode = 'standard' AND score IS NOT NULL"),
+            postgresql_where=text("mode = 'standard' AND score IS NOT NULL"),
+        ),
+        # Idempotent bulk attempt uploads; rows created online leave it NULL
+        Index("ux_reports_user_attempt", "user_id", "client_attempt_id", unique=True),
+        {"extend_existing": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -19,64 +41,205 @@ class Report(Base):
     score = Column(Float, nullable=True)
     total_correct = Column(Integer, default=0)
     total_incorrect = Column(Integer, default=0)
-    incorrect_answers = Column(JSON, default=list)
-    asked_questions = Column(MutableList.as_mutable(JSON), default=list)
+    incorrect_answers = Column(MutableList.as_mutable(JSON), default=list)
+    asked_questions = Column(MutableList.as_mutable(JSON), default=list)  # Legacy sessions only
+    cursor = Column(Integer, default=0)  # Number of questions dealt from the deck
+    version = Column(Integer, nullable=False, default=1)  # Optimistic lock for concurrent answers
+    client_attempt_id = Column(String(64), nullable=True)  # Set by bulk attempt uploads
+    # "review" sessions practise due questions; they stay out of quiz statistics and leaderboards
+    mode = Column(String(16), nullable=False, default="standard")
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Relationships
     user = relationship("User", back_populates="reports")
     quiz = relationship("Quiz", back_populates="reports")
+    deck = relationship("QuestionDeck", back_populates="report", uselist=False, cascade="all, delete-orphan")
 
     @staticmethod
-    def create_report(db: Session, user_id: int, quiz_id: int) -> "Report":
+    def create_report(
+        db: Session, user_id: int, quiz_id: int, mode: str = "standard", max_questions: int = None
+    ) -> "Report":
         """
         Create a new report for a quiz session.
+        Review sessions deal only the user's due questions, weakest first on average.
+        The report is flushed but not committed; the caller commits.
         """
-        quiz = Quiz.get_quiz_by_id(db, quiz_id)
-        if not quiz:
+        total_questions = db.query(Quiz.total_questions).filter(Quiz.id == quiz_id).scalar()
+        if total_questions is None:
             raise HTTPException(status_code=404, detail="Quiz not found")
 
-        quiz.increment_access_count()
+        if mode == "review":
+            question_order = QuestionMastery.review_order(db, user_id, quiz_id, max_questions)
+            if not question_order:
+                raise HTTPException(status_code=404, detail="No questions are due for review")
+        else:
+            Quiz.increment_access_count(db, quiz_id)
+
+            # Shuffle once up front; dealing from the deck is equivalent to repeated
+            # random.choice over the remaining questions.
+            question_order = list(range(total_questions))
+            random.shuffle(question_order)
 
         report = Report(
             user_id=user_id,
             quiz_id=quiz_id,
+            mode=mode,
             started_on=datetime.utcnow(),
             asked_questions=[],
+            cursor=0,
         )
+        report.deck = QuestionDeck(question_order=QuestionDeck.pack(question_order))
         db.add(report)
-        db.commit()
-        db.refresh(report)
+        db.flush()
+        UserStats.record_report_started(db, user_id)
         return report
 
-    def mark_completed(self, db: Session, score: float):
+    @classmethod
+    def create_from_attempt(
+        cls,
+        db: Session,
+        user_id: int,
+        quiz: Quiz,
+        attempt_id: str,
+        answers: list,
+        started_on: datetime = None,
+    ) -> tuple:
+        """
+        Record a whole attempt uploaded at once, grading every answer in one pass.
+        Answered questions go first in the deck, so a partial attempt can be
+        continued with submit-answer. Returns (report, created); created is False
+        when another request stored the same attempt first, after rolling back
+        this session. The caller commits.
+        """
+        answer_map = quiz.get_questions()
+        accepted = quiz.get_accepted_answers()
+        question_keys = quiz.get_question_keys()
+        prompts = [answer.question for answer in answers]
+
+        unknown = [prompt for prompt in prompts if prompt not in answer_map]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown questions: {unknown[:10]}")
+        if len(set(prompts)) != len(prompts):
+            raise HTTPException(status_code=400, detail="Each question can only be answered once")
+
+        # Grade the whole attempt in one pass over the answer map
+        expected = [answer_map[prompt] for prompt in prompts]
+        correct = [
+            answer_matches(answer.user_answer, accepted[answer.question], quiz.fuzzy_tolerance)
+            for answer in answers
+        ]
+
+        ordinal = {prompt: i for i, prompt in enumerate(question_keys)}
+        answered = [ordinal[prompt] for prompt in prompts]
+        answered_set = set(answered)
+        remaining = [i for i in range(len(question_keys)) if i not in answered_set]
+        random.shuffle(remaining)
+
+        timestamps = [as_utc(a.answered_on) for a in answers if a.answered_on is not None]
+        report = cls(
+            user_id=user_id,
+            quiz_id=quiz.id,
+            client_attempt_id=attempt_id,
+            started_on=as_utc(started_on) or (min(timestamps) if timestamps else datetime.utcnow()),
+            total_correct=sum(correct),
+            total_incorrect=len(correct) - sum(correct),
+            incorrect_answers=[
+                {"question": a.question, "user_answer": a.user_answer, "correct_answer": display_answer(value)}
+                for a, value, ok in zip(answers, expected, correct)
+                if not ok
+            ],
+            asked_questions=[],
+            cursor=len(answered),
+        )
+        report.deck = QuestionDeck(question_order=QuestionDeck.pack(answered + remaining))
+
+        # No savepoint: pysqlite emits SAVEPOINT without BEGIN before the first
+        # write, which would commit the report on its own. This insert is the
+        # attempt's first write, so a duplicate can roll back the whole transaction.
+        db.add(report)
+        try:
+            db.flush()
+        except IntegrityError:
+            # The same attempt was stored concurrently; report that one instead
+            db.rollback()
+            return cls.get_by_attempt_id(db, user_id, attempt_id), False
+
+        Quiz.increment_access_count(db, quiz.id)
+        UserStats.record_report_started(db, user_id)
+        question_ids = Question.get_ids_by_ordinal(db, quiz.id, answered)
+        Question.record_results(db, [(question_ids[index], ok) for index, ok in zip(answered, correct)])
+        QuestionMastery.record_answers(db, user_id, quiz.id, [
+            (question_ids[index], ok, as_utc(a.answered_on) or report.started_on)
+            for index, ok, a in zip(answered, correct, answers)
+        ])
+        if not remaining:
+            score = (report.total_correct / len(question_keys)) * 100
+            report.mark_completed(db, score, completed_on=max(timestamps) if timestamps else None)
+        else:
+            # Deal the first unanswered question, as submit-answer would have
+            report.cursor += 1
+        return report, True
+
+    @classmethod
+    def get_by_attempt_id(cls, db: Session, user_id: int, attempt_id: str) -> "Report":
+        """
+        Fetch the report created by a user's bulk attempt upload, if any.
+        """
+        return (
+            db.query(cls)
+            .filter(cls.user_id == user_id, cls.client_attempt_id == attempt_id)
+            .first()
+        )
+
+    def mark_completed(self, db: Session, score: float, completed_on: datetime = None):
         """
         Mark the report as completed and update related quiz statistics.
+        Part of the answer transaction; the caller commits.
         """
         if self.completed_on:
             raise HTTPException(
                 status_code=400, detail="This report has already been completed."
             )
 
-        self.completed_on = datetime.utcnow()
+        self.completed_on = completed_on or datetime.utcnow()
         self.score = score
 
-        # Update quiz statistics
-        quiz = db.query(Quiz).filter(Quiz.id == self.quiz_id).first()
-        if quiz:
-            quiz.increment_completion_count()
-            quiz.update_statistics(score)
+        # Update quiz and user statistics
+        UserStats.record_report_completed(db, self.user_id, score)
+        if self.mode != "review":
+            Quiz.record_completion(db, self.quiz_id, score)
+            ScoreBucket.record_score(db, self.quiz_id, score)
 
-        db.commit()
+    @staticmethod
+    def normalize_answer(answer) -> str:
+        """Normalize an answer for comparison, see utils.answer_matching."""
+        return normalize_answer(answer)
 
-    def log_answer(self, question: str, user_answer, correct_answer) -> str:
+    def log_answer(
+        self,
+        question: str,
+        user_answer,
+        correct_answer,
+        db: Session = None,
+        question_id: int = None,
+        accepted: list = None,
+        tolerance: int = 0,
+    ) -> str:
         """
         Log an answer as correct or incorrect and update totals.
+        `accepted` holds the precomputed normalized answers and `tolerance` the
+        quiz's allowed typos. With a session and question id, also updates the
+        question's answer counters and the user's mastery of it.
         """
-        # Convert user_answer and correct_answer to strings
-        user_answer_str = str(user_answer).strip().lower()
-        correct_answer_str = str(correct_answer).strip().lower()
+        correct = answer_matches(
+            user_answer, accepted if accepted is not None else accepted_answers(correct_answer), tolerance
+        )
+        if db is not None:
+            Question.record_results(db, [(question_id, correct)])
+            QuestionMastery.record_answer(db, self.user_id, self.quiz_id, question_id, correct)
 
-        if user_answer_str == correct_answer_str:
+        if correct:
             self.total_correct += 1
             return "correct"
         else:
@@ -84,17 +247,63 @@ class Report(Base):
             self.incorrect_answers.append({
                 "question": question,
                 "user_answer": user_answer,  # Keep original value for clarity
-                "correct_answer": correct_answer,  # Keep original value for clarity
+                "correct_answer": correct_answer,  # As shown to the learner
             })
             return "incorrect"
 
-    def update_asked_questions(self, question: str, db: Session):
+    def build_legacy_deck(self, db: Session, question_keys: list):
+        """
+        Build a deck for a session started before decks existed.
+        Already asked questions go first, followed by the remaining ones shuffled.
+        """
+        asked = set(self.asked_questions or [])
+        asked_indices = [i for i, q in enumerate(question_keys) if q in asked]
+        remaining = [i for i, q in enumerate(question_keys) if q not in asked]
+        random.shuffle(remaining)
+        self.deck = QuestionDeck(question_order=QuestionDeck.pack(asked_indices + remaining))
+        self.cursor = len(asked_indices)
+        db.flush()
+
+    def current_question_index(self, db: Session) -> int:
+        """
+        Return the index of the question dealt last, which an in-progress session is waiting on.
+        """
+        return QuestionDeck.get_index(db, self.id, self.cursor - 1)
+
+    def is_exhausted(self, total_questions: int) -> bool:
+        """Check whether every question in the deck has been dealt."""
+        return self.cursor >= total_questions
+
+    def deal_next_question(self, db: Session) -> int:
+        """
+        Return the index of the next question in the deck and advance the cursor.
+        Only the deck entry at the cursor is read, whatever the quiz size.
+        """
+        index = QuestionDeck.get_index(db, self.id, self.cursor)
+        self.cursor += 1
+        return index
+
+    @classmethod
+    def get_report_for_answer(cls, db: Session, report_id: int):
         """
-        Add a question to the list of asked questions.
+        Fetch a report together with the number of questions in its session and
+        the quiz's fuzzy tolerance in one query. The question count is the deck
+        length, or the quiz size for legacy sessions without a deck.
+        Locks the row where the database supports it; the version column covers the rest.
         """
-        if question not in self.asked_questions:
-            self.asked_questions.append(question)
-            db.commit()
+        deck_length = func.length(QuestionDeck.question_order) // QuestionDeck.ITEM_SIZE
+        return (
+            db.query(
+                cls,
+                func.coalesce(deck_length, Quiz.total_questions).label("total_questions"),
+                Quiz.fuzzy_tolerance,
+            )
+            .join(Quiz, Quiz.id == cls.quiz_id)
+            .outerjoin(QuestionDeck, QuestionDeck.report_id == cls.id)
+            .filter(cls.id == report_id)
+            .with_for_update(of=cls)
+            .first()
+        )
 
     @classmethod
     def get_reports_by_user(cls, db: Session, user_id: int) -> list:
@@ -110,9 +319,120 @@ class Report(Base):
         """
         return db.query(cls).filter(cls.quiz_id == quiz_id).all()
 
+    @classmethod
+    def listing_query(
+        cls,
+        user_id: int = None,
+        quiz_id: int = None,
+        completed_only: bool = False,
+        started_after: datetime = None,
+        started_before: datetime = None,
+        after_key: tuple = None,
+        before_key: tuple = None,
+    ):
+        """
+        Build the report listing query: one join to quizzes for the name, only the
+        columns the listing needs, ordered newest first by (started_on, id).
+        `after_key` is an inclusive (started_on, id) keyset position to start from,
+        `before_key` an exclusive one to stop at.
+        """
+        query = (
+            select(
+                cls.id,
+                Quiz.name.label("quiz_name"),
+                cls.started_on,
+                cls.completed_on,
+                cls.score,
+                cls.total_correct,
+                cls.total_incorrect,
+                cls.incorrect_answers,
+            )
+            .join(Quiz, Quiz.id == cls.quiz_id)
+            .order_by(cls.started_on.desc(), cls.id.desc())
+        )
+        if user_id is not None:
+            query = query.where(cls.user_id == user_id)
+        if quiz_id is not None:
+            query = query.where(cls.quiz_id == quiz_id)
+        if completed_only:
+            query = query.where(cls.completed_on.is_not(None))
+        if started_after is not None:
+            query = query.where(cls.started_on >= started_after)
+        if started_before is not None:
+            query = query.where(cls.started_on < started_before)
+        if after_key is not None:
+            started_on, report_id = after_key
+            query = query.where(
+                or_(cls.started_on < started_on, and_(cls.started_on == started_on, cls.id <= report_id))
+            )
+        if before_key is not None:
+            started_on, report_id = before_key
+            query = query.where(
+                or_(cls.started_on > started_on, and_(cls.started_on == started_on, cls.id > report_id))
+            )
+        return query
+
+    @classmethod
+    def get_top_scores(cls, db: Session, quiz_id: int, limit: int) -> list:
+        """
+        Fetch the best completed attempts of a quiz with the username of each.
+        Reads the leaderboard index in order, so cost depends on `limit` only.
+        """
+        from models.user import User
+
+        return (
+            db.query(User.username, cls.score, cls.completed_on)
+            .join(User, User.id == cls.user_id)
+            .filter(cls.quiz_id == quiz_id, cls.score.is_not(None), cls.mode == "standard")
+            .order_by(cls.score.desc(), cls.completed_on)
+            .limit(limit)
+            .all()
+        )
+
+    @classmethod
+    def get_best_score(cls, db: Session, quiz_id: int, user_id: int):
+        """Fetch a user's best completed score on a quiz, or None."""
+        return (
+            db.query(func.max(cls.score))
+            .filter(cls.quiz_id == quiz_id, cls.user_id == user_id, cls.mode == "standard")
+            .scalar()
+        )
+
     @classmethod
     def get_report_by_id(cls, db: Session, report_id: int) -> "Report":
         """
         Fetch a report by its ID.
         """
         return db.query(cls).filter(cls.id == report_id).first()
+
+    # Async counterparts for `async def` handlers using get_async_db
+    @classmethod
+    async def get_reports_by_user_async(cls, db: AsyncSession, user_id: int) -> list:
+        """
+        Fetch all reports for a given user.
+        """
+        result = await db.execute(select(cls).filter(cls.user_id == user_id))
+        return result.scalars().all()
+
+    @classmethod
+    async def get_reports_by_quiz_async(cls, db: AsyncSession, quiz_id: int) -> list:
+        """
+        Fetch all reports for a specific quiz.
+        """
+        result = await db.execute(select(cls).filter(cls.quiz_id == quiz_id))
+        return result.scalars().all()
+
+    @classmethod
+    async def get_report_by_id_async(cls, db: AsyncSession, report_id: int) -> "Report":
+        """
+        Fetch a report by its ID.
+        """
+        result = await db.execute(select(cls).filter(cls.id == report_id))
+        return result.scalars().first()
+
+
+def as_utc(value: datetime) -> datetime:
+    """Convert a client timestamp to the naive UTC datetimes stored in the database."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
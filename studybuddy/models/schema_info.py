@@ -0,0 +1,31 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from database import Base
+
+
+class SchemaInfo(Base):
+    """
+    Single row recording which schema the database was last initialized for,
+    so workers can skip table creation and migrations when nothing changed.
+    """
+    __tablename__ = "schema_info"
+    __table_args__ = {"extend_existing": True}
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(40), nullable=False)  # See utils.startup.schema_fingerprint
+    initialized_on = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    @classmethod
+    def get_fingerprint(cls, engine: Engine):
+        """Return the stored fingerprint, or None for a database never initialized this way."""
+        if not inspect(engine).has_table(cls.__tablename__):
+            return None
+        with Session(bind=engine) as db:
+            return db.query(cls.fingerprint).filter(cls.id == 1).scalar()
+
+    @classmethod
+    def set_fingerprint(cls, db: Session, fingerprint: str):
+        """Record a completed initialization. The caller commits."""
+        db.merge(cls(id=1, fingerprint=fingerprint, initialized_on=datetime.utcnow()))
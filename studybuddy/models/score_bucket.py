@@ -0,0 +1,86 @@
+from sqlalchemy import Column, Integer, ForeignKey, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import Base
+
+MAX_SCORE_BUCKET = 100  # Scores are percentages; one bucket per whole point
+
+
+class ScoreBucket(Base):
+    """
+    Histogram of completed scores per quiz, one row per whole-point bucket.
+    Percentile lookups read at most MAX_SCORE_BUCKET + 1 rows, however many attempts a quiz has.
+    """
+    __tablename__ = "score_buckets"
+    __table_args__ = {"extend_existing": True}
+
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    bucket = Column(Integer, primary_key=True)  # floor(score), clamped to 0..MAX_SCORE_BUCKET
+    count = Column(Integer, default=0, nullable=False)
+
+    @staticmethod
+    def bucket_for(score: float) -> int:
+        """Map a score onto its histogram bucket."""
+        return max(0, min(int(score), MAX_SCORE_BUCKET))
+
+    @classmethod
+    def record_score(cls, db: Session, quiz_id: int, score: float):
+        """Count one completed score with an atomic increment, creating the bucket on first use."""
+        bucket = cls.bucket_for(score)
+        increment = (
+            update(cls)
+            .where(cls.quiz_id == quiz_id, cls.bucket == bucket)
+            .values(count=cls.count + 1)
+        )
+        if db.execute(increment, execution_options={"synchronize_session": False}).rowcount:
+            return
+        try:
+            with db.begin_nested():
+                db.add(cls(quiz_id=quiz_id, bucket=bucket, count=1))
+        except IntegrityError:
+            # Another request created the bucket first
+            db.execute(increment, execution_options={"synchronize_session": False})
+
+    @classmethod
+    def get_percentile(cls, db: Session, quiz_id: int, score: float) -> dict:
+        """
+        Percentage of completed attempts scoring below `score`, counting half of
+        the attempts in the same bucket. Also returns the total attempt count.
+        """
+        bucket = cls.bucket_for(score)
+        rows = db.query(cls.bucket, cls.count).filter(cls.quiz_id == quiz_id).all()
+        total = sum(count for _, count in rows)
+        if not total:
+            return {"total_attempts": 0, "percentile": None}
+        below = sum(count for b, count in rows if b < bucket)
+        same = sum(count for b, count in rows if b == bucket)
+        return {"total_attempts": total, "percentile": 100.0 * (below + same / 2) / total}
+
+    @classmethod
+    def rebuild(cls, db: Session, quiz_ids: list = None) -> int:
+        """
+        Recompute the histograms from completed reports.
+        Rebuilds every quiz when `quiz_ids` is None. The caller commits.
+        """
+        from models.report import Report
+
+        query = db.query(Report.quiz_id, Report.score).filter(
+            Report.score.is_not(None), Report.mode == "standard"
+        )
+        existing = db.query(cls)
+        if quiz_ids is not None:
+            query = query.filter(Report.quiz_id.in_(quiz_ids))
+            existing = existing.filter(cls.quiz_id.in_(quiz_ids))
+
+        counts = {}
+        for quiz_id, score in query.yield_per(1000):
+            key = (quiz_id, cls.bucket_for(score))
+            counts[key] = counts.get(key, 0) + 1
+
+        existing.delete(synchronize_session=False)
+        if counts:
+            db.execute(
+                cls.__table__.insert(),
+                [{"quiz_id": q, "bucket": b, "count": c} for (q, b), c in counts.items()],
+            )
+        return len(counts)
@@ -1,20 +1,16 @@
 # models.py
 
 import os
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, select, event, inspect
 from datetime import datetime
 from sqlalchemy.orm import relationship, Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import Base, SessionLocal
-from passlib.context import CryptContext
-from utils.utils import verify_password
-from sqlalchemy.sql import func
-from models.quiz import Quiz
-from models.report import Report
+from utils.utils import verify_password, verify_password_async, hash_password
+from utils.token_cache import token_cache
+from models.user_stats import UserStats
 
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 class User(Base):
     __tablename__ = "users"
 
@@ -35,10 +31,12 @@ class User(Base):
 
     def verify_password(self, plain_password: str, hashed_password: str):
         """Verify the provided password against the stored hashed password."""
-        from passlib.context import CryptContext
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
         return verify_password(plain_password, hashed_password)
 
+    async def verify_password_async(self, plain_password: str, hashed_password: str):
+        """Verify the provided password on the password pool without blocking the event loop."""
+        return await verify_password_async(plain_password, hashed_password)
+
     @classmethod
     def create_user(cls, db_session, username: str, hashed_password: str):
         """Create and save a new user."""
@@ -62,31 +60,79 @@ class User(Base):
         """Check if a username already exists."""
         return db_session.query(cls).filter(cls.username == username).first() is not None
     
+    # Async counterparts for `async def` handlers using get_async_db
+    @classmethod
+    async def get_user_by_username_async(cls, db_session: AsyncSession, username: str):
+        """Fetch a user by username."""
+        result = await db_session.execute(select(cls).filter(cls.username == username))
+        return result.scalars().first()
+
+    @classmethod
+    async def get_user_by_id_async(cls, db_session: AsyncSession, user_id: int):
+        """Fetch a user by ID."""
+        result = await db_session.execute(select(cls).filter(cls.id == user_id))
+        return result.scalars().first()
+
+    @classmethod
+    async def create_user_async(cls, db_session: AsyncSession, username: str, hashed_password: str):
+        """Create and save a new user."""
+        user = cls(username=username, password=hashed_password)
+        db_session.add(user)
+        await db_session.commit()
+        return user
+
+    @classmethod
+    async def username_exists_async(cls, db_session: AsyncSession, username: str):
+        """Check if a username already exists."""
+        result = await db_session.execute(select(cls.id).filter(cls.username == username))
+        return result.first() is not None
+
+    @classmethod
+    def profile_query(cls):
+        """Select user details joined with their precomputed aggregates from user_stats."""
+        return (
+            select(
+                cls.id,
+                cls.username,
+                cls.created_on,
+                UserStats.total_quizzes_created,
+                UserStats.total_reports_created,
+                UserStats.total_reports_completed,
+                UserStats.average_score,
+                UserStats.last_activity,
+            )
+            .outerjoin(UserStats, UserStats.user_id == cls.id)
+        )
+
+    @staticmethod
+    def profile_to_dict(row) -> dict:
+        """Serialize a profile_query row."""
+        return {
+            "id": row.id,
+            "username": row.username,
+            "created_on": row.created_on,
+            "total_quizzes_created": row.total_quizzes_created or 0,
+            "total_reports_created": row.total_reports_created or 0,
+            "total_reports_completed": row.total_reports_completed or 0,
+            "average_score": row.average_score,
+            "last_activity": row.last_activity,
+        }
+
+    @classmethod
+    def get_profile(cls, db: Session, user_id: int):
+        """Fetch a serialized user profile in one query, or None if the user does not exist."""
+        row = db.execute(cls.profile_query().where(cls.id == user_id)).first()
+        return cls.profile_to_dict(row) if row else None
+
     def to_dict(self, db: Session) -> dict:
         """
         Serialize user information to a dictionary.
-        Query related quizzes and reports explicitly.
+        Counts come from the user_stats table rather than counting rows.
         """
-        try:
-            # Debugging outputs
-            print(f"Processing user: {self.username}, ID: {self.id}")
-
-            # Count related quizzes
-            total_quizzes_created = db.query(func.count(Quiz.id)).filter(Quiz.created_by == self.id).scalar()
-            total_reports_created = db.query(func.count(Report.id)).filter(Report.user_id == self.id).scalar()
-
-            return {
-                "id": self.id,
-                "username": self.username,
-                "created_on": self.created_on,
-                "total_quizzes_created": total_quizzes_created,
-                "total_reports_created": total_reports_created,
-            }
-        except Exception as e:
-            print(f"Error serializing user {self.id}: {e}")
-            raise
-
-    def create_admin():
+        return User.get_profile(db, self.id)
+
+    @staticmethod
+    def create_admin(session_factory=None):
         """
         Create a default admin user if it doesn't already exist.
         """
@@ -95,7 +141,8 @@ class User(Base):
         admin_username = os.getenv("ADMIN_USERNAME", "admin")
         admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
 
-        with SessionLocal() as db:
+        session_factory = session_factory or SessionLocal
+        with session_factory() as db:
             try:
                 # Check if admin user already exists
                 existing_admin = db.query(User).filter_by(username=admin_username).first()
@@ -104,7 +151,7 @@ class User(Base):
                     return
 
                 # Create admin user
-                hashed_password = pwd_context.hash(admin_password)
+                hashed_password = hash_password(admin_password)
                 admin_user = User(username=admin_username, password=hashed_password, is_admin=1)
                 db.add(admin_user)
                 db.commit()
@@ -113,3 +160,11 @@ class User(Base):
                 db.rollback()
                 print(f"Error creating admin user: {e}")
 
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_tokens(mapper, connection, target):
+    """Cached principals must not outlive a change to the user they describe."""
+    usernames = {target.username, *inspect(target).attrs.username.history.deleted}
+    for username in usernames:
+        token_cache.invalidate_user(username)
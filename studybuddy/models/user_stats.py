@@ -0,0 +1,132 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Float, update, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import Base
+
+
+class UserStats(Base):
+    """
+    Per-user aggregates, maintained incrementally when quizzes are uploaded and
+    reports are started or completed, so user listings never count rows.
+    """
+    __tablename__ = "user_stats"
+    __table_args__ = {"extend_existing": True}
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_quizzes_created = Column(Integer, default=0, nullable=False)
+    total_reports_created = Column(Integer, default=0, nullable=False)
+    total_reports_completed = Column(Integer, default=0, nullable=False)
+    average_score = Column(Float, nullable=True)  # Average over completed reports
+    last_activity = Column(DateTime, nullable=True)  # Latest upload, start or completion
+
+    @classmethod
+    def apply_delta(
+        cls,
+        db: Session,
+        user_id: int,
+        quizzes_created: int = 0,
+        reports_created: int = 0,
+        completed_score: float = None,
+    ):
+        """
+        Apply aggregate deltas for a user in a single UPDATE statement.
+        Users without a row yet get one computed from the source tables.
+        """
+        values = {"last_activity": datetime.utcnow()}
+        if quizzes_created:
+            values["total_quizzes_created"] = cls.total_quizzes_created + quizzes_created
+        if reports_created:
+            values["total_reports_created"] = cls.total_reports_created + reports_created
+        if completed_score is not None:
+            # Right-hand sides all see the pre-update row
+            values["total_reports_completed"] = cls.total_reports_completed + 1
+            values["average_score"] = (
+                func.coalesce(cls.average_score, 0.0) * cls.total_reports_completed + completed_score
+            ) / (cls.total_reports_completed + 1)
+
+        increment = update(cls).where(cls.user_id == user_id).values(**values)
+        if db.execute(increment, execution_options={"synchronize_session": False}).rowcount:
+            return
+        try:
+            with db.begin_nested():
+                cls.rebuild(db, user_ids=[user_id])
+        except IntegrityError:
+            # Another request created the row first, from rows this one has not committed yet
+            db.execute(increment, execution_options={"synchronize_session": False})
+
+    @classmethod
+    def record_quiz_created(cls, db: Session, user_id: int):
+        """Count a quiz upload."""
+        cls.apply_delta(db, user_id, quizzes_created=1)
+
+    @classmethod
+    def record_report_started(cls, db: Session, user_id: int):
+        """Count a new quiz session."""
+        cls.apply_delta(db, user_id, reports_created=1)
+
+    @classmethod
+    def record_report_completed(cls, db: Session, user_id: int, score: float):
+        """Count a completed quiz session and fold in its score."""
+        cls.apply_delta(db, user_id, completed_score=score)
+
+    @classmethod
+    def rebuild(cls, db: Session, user_ids: list = None) -> int:
+        """
+        Recompute aggregates from the users, quizzes and reports tables.
+        Rebuilds every user when `user_ids` is None. The caller commits.
+        """
+        from models.user import User
+        from models.quiz import Quiz
+        from models.report import Report
+
+        def scoped(query, column):
+            return query.filter(column.in_(user_ids)) if user_ids is not None else query
+
+        quizzes = dict(
+            scoped(db.query(Quiz.created_by, func.count(Quiz.id)), Quiz.created_by)
+            .group_by(Quiz.created_by)
+            .all()
+        )
+        last_upload = dict(
+            scoped(db.query(Quiz.created_by, func.max(Quiz.created_on)), Quiz.created_by)
+            .group_by(Quiz.created_by)
+            .all()
+        )
+        reports = {
+            row.user_id: row
+            for row in scoped(
+                db.query(
+                    Report.user_id,
+                    func.count(Report.id).label("created"),
+                    func.count(Report.completed_on).label("completed"),
+                    func.avg(Report.score).label("average_score"),
+                    func.max(Report.started_on).label("last_started"),
+                    func.max(Report.completed_on).label("last_completed"),
+                ),
+                Report.user_id,
+            )
+            .group_by(Report.user_id)
+            .all()
+        }
+
+        rows = []
+        for (user_id,) in scoped(db.query(User.id), User.id).all():
+            report = reports.get(user_id)
+            activity = [last_upload.get(user_id)]
+            if report is not None:
+                activity += [report.last_started, report.last_completed]
+            activity = [a for a in activity if a is not None]
+            rows.append({
+                "user_id": user_id,
+                "total_quizzes_created": quizzes.get(user_id, 0),
+                "total_reports_created": report.created if report else 0,
+                "total_reports_completed": report.completed if report else 0,
+                "average_score": report.average_score if report else None,
+                "last_activity": max(activity) if activity else None,
+            })
+
+        scoped(db.query(cls), cls.user_id).delete(synchronize_session=False)
+        if rows:
+            db.execute(cls.__table__.insert(), rows)
+        return len(rows)
@@ -1,12 +1,23 @@
 import os
-import random
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status, UploadFile, File, Form
 from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database import get_db
-import pandas as pd
-from models import User, Quiz, Report
-from dependencies import get_current_user
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db, get_async_db
+from models import Quiz, Report, Question, QuestionDeck, UserStats, ScoreBucket, QuizAnalytics
+from dependencies import get_current_principal
+from utils.token_cache import Principal
+from utils.csv_ingest import ingest_questions_csv
+from utils.session_store import session_store, SessionConflict
+from utils.analytics import ANALYTICS_MAX_AGE_SECONDS, ANALYTICS_RETRY_AFTER, refreshing, refresh_analytics
+from utils.answer_matching import MAX_FUZZY_TOLERANCE, display_answer
+from utils.response_cache import response_cache, CATALOGUE_KEY, quiz_key
+from utils.search import SEARCH_TRUNCATED_HEADER, index_quiz, search_quizzes
+from utils.serialization import TrustedJSONResponse
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+from schemas import AttemptRequest
 
 router = APIRouter()
 
@@ -15,31 +26,69 @@ MAX_QUIZZES_PER_USER = int(os.getenv("MAX_QUIZZES_PER_USER", 10))  # Default is
 
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def list_all_quizzes(db: Session = Depends(get_db)):
+async def list_all_quizzes(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     List all quizzes.
+    Served from the response cache with an ETag; If-None-Match gets a 304 without a query.
     """
-    quizzes = Quiz.get_all_quizzes(db)
-    return [
+    cached = response_cache.get(CATALOGUE_KEY)
+    if cached is None:
+        generation = response_cache.generation(CATALOGUE_KEY)
+        quizzes = await Quiz.get_catalogue_async(db)
+        cached = response_cache.put(CATALOGUE_KEY, [
+            {
+                "id": quiz.id,
+                "name": quiz.name,
+                "created_on": quiz.created_on,
+                "total_questions": quiz.total_questions,
+            }
+            for quiz in quizzes
+        ], generation)
+    return cached.to_response(request, response_cache)
+
+
+@router.get("/search", status_code=status.HTTP_200_OK)
+async def search_all_quizzes(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Find quizzes whose name, questions or answers contain every word of `q`, best match first.
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
+    When more quizzes match than can be ranked, only the newest are returned and
+    every page carries `X-Search-Truncated: true`; a more specific query finds the rest.
+    """
+    after_key = decode_cursor(cursor, float, int, int) if cursor else None
+    results, next_key, truncated = await search_quizzes(db, q, limit, after_key)
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(*next_key)} if next_key else {}
+    if truncated:
+        headers[SEARCH_TRUNCATED_HEADER] = "true"
+    return TrustedJSONResponse([
         {
-            "id": quiz.id,
-            "name": quiz.name,
-            "created_on": quiz.created_on,
-            "total_questions": quiz.total_questions,
+            "id": result.id,
+            "name": result.name,
+            "created_on": result.created_on,
+            "total_questions": result.total_questions,
+            "snippet": result.snippet,
         }
-        for quiz in quizzes
-    ]
+        for result in results
+    ], headers=headers)
 
 
 @router.post("/upload-csv", status_code=status.HTTP_201_CREATED)
-async def upload_csv(
+def upload_csv(
     file: UploadFile = File(...),
     name: str = Form(...),
+    fuzzy_tolerance: int = Form(0, ge=0, le=MAX_FUZZY_TOLERANCE),
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Upload a CSV file to create a new quiz with a unique name.
+    The file is streamed and inserted in batches, so this runs in the threadpool
+    instead of blocking the event loop.
     """
     # Check if the quiz limit has been reached
     user_quiz_count = db.query(func.count(Quiz.id)).filter(Quiz.created_by == current_user.id).scalar()
@@ -58,24 +107,21 @@ async def upload_csv(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be a CSV.")
 
     try:
-        # Read the CSV into a DataFrame
-        df = pd.read_csv(file.file)
-        if "Q" not in df.columns or "A" not in df.columns:
+        # Create the quiz first so question rows can reference it
+        quiz = Quiz(name=name, created_by=current_user.id, fuzzy_tolerance=fuzzy_tolerance)
+        db.add(quiz)
+        db.flush()
+
+        result = ingest_questions_csv(db, quiz, file.file)
+        if result["total_questions"] == 0:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="CSV must contain 'Q' and 'A' columns.",
+                detail={"message": "CSV contains no valid questions.", "errors": result["errors"]},
             )
 
-        # Create the quiz
-        questions = dict(zip(df["Q"], df["A"]))
-        quiz = Quiz(
-            name=name,
-            questions=questions,
-            total_questions=len(questions),
-            created_by=current_user.id,
-        )
-        quiz.set_questions(questions)
-        db.add(quiz)
+        UserStats.record_quiz_created(db, current_user.id)
+        index_quiz(db, quiz.id)
+        response_cache.invalidate_on_commit(db, CATALOGUE_KEY)
         db.commit()
         db.refresh(quiz)
 
@@ -85,8 +131,15 @@ async def upload_csv(
             "id": quiz.id,
             "name": name,
             "created_on": quiz.created_on,
+            "fuzzy_tolerance": quiz.fuzzy_tolerance,
+            "skipped_rows": result["skipped_rows"],
+            "errors": result["errors"],
         }
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing file: {str(e)}",
@@ -96,29 +149,35 @@ async def upload_csv(
 @router.post("/start", status_code=status.HTTP_201_CREATED)
 def start_quiz(
     quiz_id: int,
+    mode: str = Query("standard", pattern="^(standard|review)$"),
+    max_questions: int = Query(None, ge=1, description="Review sessions only: deck size limit"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
     Start a new quiz session (create a report).
+    mode=review deals the questions due for review, sampled by weakness.
     """
 
-    # Get the report and quiz to start the quiz with a first question
-    report = Report.create_report(db=db, user_id=current_user.id, quiz_id=quiz_id)
-    quiz = Quiz.get_quiz_by_id(db, quiz_id)
-    all_questions = [q for q in quiz.get_questions().keys()]
-    next_question = random.choice(all_questions)
-    report.update_asked_questions(next_question, db)
+    # Create the report and deal the first question in one transaction
+    report = Report.create_report(
+        db=db, user_id=current_user.id, quiz_id=quiz_id, mode=mode, max_questions=max_questions
+    )
+    next_question = Question.get_by_ordinal(db, quiz_id, report.deal_next_question(db)).prompt
 
-    return {
+    # Build the response before committing so nothing is reloaded afterwards
+    response = {
         "status": "in_progress",
         "total_correct": report.total_correct,
         "total_incorrect": report.total_incorrect,
         "next_question": next_question,
-        "total_questions": quiz.total_questions,
+        "total_questions": len(report.deck.question_order) // QuestionDeck.ITEM_SIZE,
         "report_id": report.id,
+        "mode": report.mode,
         "started_on": report.started_on
     }
+    db.commit()
+    return response
 
 
 @router.post("/{quiz_id}/submit-answer")
@@ -131,71 +190,339 @@ def submit_answer(
 ):
     """
     Submit an answer and determine the next question or completion status.
+    The whole step (log the answer, advance the session, maybe complete it and
+    update statistics) is one transaction with a single commit.
     """
-    report = Report.get_report_by_id(db, report_id)
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
+    if session_store.enabled:
+        with session_store.checkout(db, report_id) as state:
+            if state is not None:
+                return submit_buffered_answer(db, state, quiz_id, question, user_answer)
 
-    quiz = Quiz.get_quiz_by_id(db, quiz_id)
-    if not quiz:
-        raise HTTPException(status_code=404, detail="Quiz not found")
+    row = Report.get_report_for_answer(db, report_id)
+    if not row or row.Report.quiz_id != quiz_id:
+        raise HTTPException(status_code=404, detail="Report not found")
+    report, total_questions, tolerance = row
 
-    all_questions = quiz.get_questions()
-    correct_answer = all_questions.get(question)
-    if not correct_answer:
+    submitted = Question.get_by_prompt(db, quiz_id, question)
+    if not submitted:
         raise HTTPException(status_code=400, detail="Invalid question submitted")
+    correct_answer = display_answer(submitted.answer)
 
     # Log the answer
-    result = report.log_answer(question, user_answer, correct_answer)
+    result = report.log_answer(
+        question,
+        user_answer,
+        correct_answer,
+        db=db,
+        question_id=submitted.id,
+        accepted=submitted.get_accepted_answers(),
+        tolerance=tolerance,
+    )
 
-    # Determine remaining questions
-    remaining_questions = [
-        q for q in all_questions.keys() if q not in report.asked_questions
-    ]
+    # Sessions started before decks existed get one built from their asked questions
+    if report.cursor is None:
+        report.build_legacy_deck(db, Quiz.get_quiz_by_id(db, quiz_id).get_question_keys())
 
-    if not remaining_questions:
+    if report.is_exhausted(total_questions):
         # Quiz completed
-        score = (report.total_correct / quiz.total_questions) * 100
+        score = (report.total_correct / total_questions) * 100
         report.mark_completed(db, score)
-        return {
+        response = {
             "status": "completed",
             "message": "Quiz completed!",
             "total_correct": report.total_correct,
             "total_incorrect": report.total_incorrect,
             "score": score,
         }
+        commit_answer(db)
+        return response
 
-    # Get the next question
-    next_question = random.choice(remaining_questions)
-    report.update_asked_questions(next_question, db)
-
-    return {
+    # Deal the next question from the session's shuffled deck
+    next_question = Question.get_by_ordinal(db, quiz_id, report.deal_next_question(db)).prompt
+    response = {
         "status": "in_progress",
         "result": result,
         "correct_answer": correct_answer if result == "incorrect" else None,
         "total_correct": report.total_correct,
         "total_incorrect": report.total_incorrect,
         "next_question": next_question,
-        "total_questions": quiz.total_questions,
+        "total_questions": total_questions,
     }
+    commit_answer(db)
+    return response
+
+
+def submit_buffered_answer(db: Session, state, quiz_id: int, question: str, user_answer: str) -> dict:
+    """
+    submit-answer for a session held in the session store (SESSION_STORE=memory).
+    Only checkpoints and completion touch the database; see utils/session_store.py.
+    """
+    if state.quiz_id != quiz_id:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if question not in state.decoded.questions:
+        raise HTTPException(status_code=400, detail="Invalid question submitted")
+    if question != state.current_question():
+        # After a crash the session resumes from its last checkpoint
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "This session is waiting on a different question.",
+                "current_question": state.current_question(),
+            },
+        )
+
+    result, correct_answer = state.log_answer(question, user_answer)
+
+    if state.is_exhausted():
+        # Persist the whole session together with its completion
+        session_store.discard(state.report_id)
+        report, total_questions, _ = Report.get_report_for_answer(db, state.report_id)
+        if report.version != state.version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This report was updated by another request. Please retry.",
+            )
+        state.apply_to(report)
+        state.write_mastery(db)
+        score = (report.total_correct / total_questions) * 100
+        report.mark_completed(db, score)
+        response = {
+            "status": "completed",
+            "message": "Quiz completed!",
+            "total_correct": report.total_correct,
+            "total_incorrect": report.total_incorrect,
+            "score": score,
+        }
+        commit_answer(db)
+        return response
+
+    next_question = state.deal_next_question()
+    response = {
+        "status": "in_progress",
+        "result": result,
+        "correct_answer": correct_answer if result == "incorrect" else None,
+        "total_correct": state.total_correct,
+        "total_incorrect": state.total_incorrect,
+        "next_question": next_question,
+        "total_questions": state.total_questions,
+    }
+    if state.checkpoint_due(session_store.checkpoint_answers, session_store.checkpoint_seconds):
+        try:
+            session_store.checkpoint(db, state)
+            db.commit()
+        except SessionConflict:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="This report was updated by another request. Please retry.",
+            )
+        except Exception:
+            # The row keeps the previous checkpoint; continue from it on the next answer
+            db.rollback()
+            session_store.discard(state.report_id)
+            raise
+    return response
+
+
+@router.post("/{quiz_id}/attempts", status_code=status.HTTP_201_CREATED)
+def submit_attempt(
+    quiz_id: int,
+    attempt: AttemptRequest,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Upload a whole attempt answered offline, graded and stored in one transaction.
+    Retrying with the same attempt_id returns the stored result with status 200.
+    """
+    report = Report.get_by_attempt_id(db, current_user.id, attempt.attempt_id)
+    if report is None:
+        quiz = Quiz.get_quiz_by_id(db, quiz_id)
+        if not quiz:
+            raise HTTPException(status_code=404, detail="Quiz not found")
+        report, created = Report.create_from_attempt(
+            db,
+            user_id=current_user.id,
+            quiz=quiz,
+            attempt_id=attempt.attempt_id,
+            answers=attempt.answers,
+            started_on=attempt.started_on,
+        )
+    else:
+        created = False
+
+    if report.quiz_id != quiz_id:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This attempt_id was already used for another quiz.",
+        )
+
+    result = attempt_summary(db, report)
+    if created:
+        db.commit()
+    else:
+        response.status_code = status.HTTP_200_OK
+    return result
+
+
+def attempt_summary(db: Session, report: Report) -> dict:
+    """
+    Describe a report created by an attempt upload; in-progress ones include the question to continue with.
+    """
+    summary = {
+        "status": "completed" if report.completed_on else "in_progress",
+        "report_id": report.id,
+        "attempt_id": report.client_attempt_id,
+        "total_correct": report.total_correct,
+        "total_incorrect": report.total_incorrect,
+        "score": report.score,
+        "incorrect_answers": list(report.incorrect_answers or []),
+        "started_on": report.started_on,
+        "completed_on": report.completed_on,
+    }
+    if not report.completed_on:
+        summary["next_question"] = Question.get_by_ordinal(
+            db, report.quiz_id, report.current_question_index(db)
+        ).prompt
+    return summary
+
+
+def commit_answer(db: Session):
+    """
+    Commit an answer step, turning a lost race on the report's version into a 409.
+    """
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="This report was updated by another request. Please retry.",
+        )
+
+
+@router.get("/{quiz_id}/leaderboard", status_code=status.HTTP_200_OK)
+def get_leaderboard(
+    quiz_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Get the top scores of a quiz and where the caller's best score ranks.
+    The percentile is the share of completed attempts scoring below the caller's best.
+    """
+    if not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
+    top_scores = Report.get_top_scores(db, quiz_id, limit)
+    best_score = Report.get_best_score(db, quiz_id, current_user.id)
+    ranking = ScoreBucket.get_percentile(db, quiz_id, best_score if best_score is not None else 0.0)
+
+    return TrustedJSONResponse({
+        "quiz_id": quiz_id,
+        "total_attempts": ranking["total_attempts"],
+        "top_scores": [
+            {"rank": rank, "username": username, "score": score, "completed_on": completed_on}
+            for rank, (username, score, completed_on) in enumerate(top_scores, start=1)
+        ],
+        "user_best_score": best_score,
+        "user_percentile": ranking["percentile"] if best_score is not None else None,
+    })
+
+
+@router.get("/{quiz_id}/analytics", status_code=status.HTTP_200_OK)
+def get_quiz_analytics(
+    quiz_id: int,
+    background_tasks: BackgroundTasks,
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Per-question difficulty, discrimination and common wrong answers, hardest first.
+    Served from the stored snapshot; a stale snapshot is returned as is and
+    rebuilt in the background. Before the first snapshot exists it is built in
+    the background too, and the response is 202 with a Retry-After header.
+    Only the quiz's author or an admin can see it.
+    """
+    created_by = db.query(Quiz.created_by).filter(Quiz.id == quiz_id).scalar()
+    if created_by is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if created_by != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only the quiz author can view its analytics")
+
+    analytics = QuizAnalytics.get(db, quiz_id)
+    if analytics is None:
+        # First request for this quiz: building scans every logged wrong answer,
+        # so keep it off the request and let the client poll
+        if refreshing.claim(quiz_id):
+            background_tasks.add_task(refresh_analytics, quiz_id)
+        return TrustedJSONResponse(
+            {"quiz_id": quiz_id, "status": "pending"},
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"Retry-After": str(ANALYTICS_RETRY_AFTER)},
+        )
+    if analytics.age_seconds() > ANALYTICS_MAX_AGE_SECONDS and refreshing.claim(quiz_id):
+        background_tasks.add_task(refresh_analytics, quiz_id)
+
+    return TrustedJSONResponse({
+        "quiz_id": quiz_id,
+        "computed_on": analytics.computed_on,
+        "answers_logged": analytics.answers_logged,
+        "total_questions": len(analytics.questions),
+        "questions": analytics.questions[:limit],
+    })
+
+
+@router.patch("/{quiz_id}", status_code=status.HTTP_200_OK)
+def update_quiz_settings(
+    quiz_id: int,
+    fuzzy_tolerance: int = Query(..., ge=0, le=MAX_FUZZY_TOLERANCE),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    """
+    Change how many typos a quiz tolerates in answers. Only the quiz's author or an admin can.
+    Sessions already buffered in the session store keep the tolerance they were loaded with.
+    """
+    quiz = Quiz.get_quiz_by_id(db, quiz_id)
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    if quiz.created_by != current_user.id and not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Only the quiz author can change its settings")
+
+    quiz.fuzzy_tolerance = fuzzy_tolerance
+    response_cache.invalidate_on_commit(db, quiz_key(quiz_id))
+    db.commit()
+    return {"id": quiz_id, "fuzzy_tolerance": fuzzy_tolerance}
 
 
 @router.get("/{quiz_id}", status_code=status.HTTP_200_OK)
-def get_quiz_details(quiz_id: int, db: Session = Depends(get_db)):
+async def get_quiz_details(quiz_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Get details of a specific quiz.
+    Cached like the quiz list and invalidated whenever the quiz's statistics change.
     """
-    quiz = Quiz.get_quiz_by_id(db, quiz_id)
+    key = quiz_key(quiz_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached.to_response(request, response_cache)
+
+    generation = response_cache.generation(key)
+    quiz = await Quiz.get_quiz_by_id_async(db, quiz_id)
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
-    return {
+    return response_cache.put(key, {
         "id": quiz.id,
         "name": quiz.name,
         "created_on": quiz.created_on,
         "total_questions": quiz.total_questions,
+        "fuzzy_tolerance": quiz.fuzzy_tolerance,
         "times_accessed": quiz.times_accessed,
         "times_completed": quiz.times_completed,
         "highest_score": quiz.highest_score,
         "average_score": quiz.average_score,
-    }
+    }, generation).to_response(request, response_cache)
@@ -1,63 +1,119 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_db, SessionLocal
 from models import Report, Quiz
 from schemas import ScoreResponse
-from typing import List
-from dependencies import get_current_user
+from typing import List, Optional
+from dependencies import get_current_principal
+from utils.token_cache import Principal
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    NEXT_CURSOR_HEADER,
+    decode_cursor,
+    encode_cursor,
+    stream_json_array,
+)
+from utils.serialization import TrustedJSONResponse
 
 router = APIRouter()
 
+def paginated_reports(
+    db: Session,
+    limit: int,
+    cursor: Optional[str],
+    **filters,
+) -> StreamingResponse:
+    """
+    Stream one keyset page of reports as a JSON array.
+    The position of the next page is returned in the X-Next-Cursor header.
+    """
+    after_key = decode_cursor(cursor, datetime, int) if cursor else None
+    query = Report.listing_query(after_key=after_key, **filters)
+
+    # The first row after this page is where the next page starts
+    boundary = db.execute(
+        query.with_only_columns(Report.started_on, Report.id).offset(limit).limit(1)
+    ).first()
+    headers = {NEXT_CURSOR_HEADER: encode_cursor(*boundary)} if boundary else {}
+
+    # Stream every row ahead of the boundary rather than the first `limit`: a
+    # report stored after the boundary was read then joins this page instead of
+    # pushing its last row past the cursor, where no page would ever send it.
+    page = Report.listing_query(after_key=after_key, before_key=tuple(boundary) if boundary else None, **filters)
+
+    def rows():
+        # Dependency sessions close before the body is sent, so stream from our own
+        with SessionLocal() as stream_db:
+            result = stream_db.execute(page, execution_options={"yield_per": 200})
+            for row in result:
+                yield {
+                    "quiz_name": row.quiz_name,
+                    "started_on": row.started_on,
+                    "completed_on": row.completed_on,
+                    "score": row.score,
+                    "total_correct": row.total_correct,
+                    "total_incorrect": row.total_incorrect,
+                    "incorrect_answers": row.incorrect_answers or [],
+                }
+
+    return StreamingResponse(stream_json_array(rows()), media_type="application/json", headers=headers)
+
+
 @router.get("/by-user", response_model=List[ScoreResponse])
 def get_reports_by_user(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    completed_only: bool = False,
+    started_after: Optional[datetime] = None,
+    started_before: Optional[datetime] = None,
     db: Session = Depends(get_db),
-    current_user: dict = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
 ):
     """
-    Get all reports for the current user.
+    Get the current user's reports, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
     """
-    reports = Report.get_reports_by_user(db, user_id=current_user.id)
-    return [
-        {
-            "quiz_name": db.query(Quiz).filter(Quiz.id == report.quiz_id).first().name,
-            "started_on": report.started_on,
-            "completed_on": report.completed_on,
-            "score": report.score,
-            "total_correct": report.total_correct,
-            "total_incorrect": report.total_incorrect,
-            "incorrect_answers": report.incorrect_answers,
-        }
-        for report in reports
-    ]
+    return paginated_reports(
+        db,
+        limit,
+        cursor,
+        user_id=current_user.id,
+        completed_only=completed_only,
+        started_after=started_after,
+        started_before=started_before,
+    )
 
 @router.get("/by-quiz/{quiz_id}", response_model=List[ScoreResponse])
-def get_reports_by_quiz(quiz_id: int, db: Session = Depends(get_db)):
+def get_reports_by_quiz(
+    quiz_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    completed_only: bool = False,
+    started_after: Optional[datetime] = None,
+    started_before: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
     """
-    Get all reports for a specific quiz.
+    Get the reports for a specific quiz, newest first.
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page.
     """
-    # Fetch all reports for the quiz
-    reports = Report.get_reports_by_quiz(db, quiz_id=quiz_id)
-    if not reports:
-        raise HTTPException(status_code=404, detail="No reports found for this quiz")
-
-    # Get the quiz name
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if not quiz:
+    if not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
         raise HTTPException(status_code=404, detail="Quiz not found")
+    if not cursor and not db.query(Report.id).filter(Report.quiz_id == quiz_id).first():
+        raise HTTPException(status_code=404, detail="No reports found for this quiz")
 
-    # Transform the reports into the expected schema format
-    return [
-        {
-            "quiz_name": quiz.name,
-            "started_on": report.started_on.isoformat() if report.started_on else None,
-            "completed_on": report.completed_on.isoformat() if report.completed_on else None,
-            "score": report.score,
-            "total_correct": report.total_correct,
-            "total_incorrect": report.total_incorrect,
-            "incorrect_answers": report.incorrect_answers if report.incorrect_answers else [],
-        }
-        for report in reports
-    ]
+    return paginated_reports(
+        db,
+        limit,
+        cursor,
+        quiz_id=quiz_id,
+        completed_only=completed_only,
+        started_after=started_after,
+        started_before=started_before,
+    )
 
 @router.get("/{report_id}", response_model=ScoreResponse)
 def get_report_by_id(report_id: int, db: Session = Depends(get_db)):
@@ -74,13 +130,13 @@ def get_report_by_id(report_id: int, db: Session = Depends(get_db)):
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
 
-    # Serialize the data
-    return {
+    # Stored rows already match ScoreResponse, so skip re-validating every incorrect answer
+    return TrustedJSONResponse({
         "quiz_name": quiz.name,
-        "started_on": report.started_on.isoformat() if report.started_on else None,
-        "completed_on": report.completed_on.isoformat() if report.completed_on else None,
+        "started_on": report.started_on,
+        "completed_on": report.completed_on,
         "score": report.score,
         "total_correct": report.total_correct,
         "total_incorrect": report.total_incorrect,
-        "incorrect_answers": report.incorrect_answers,  # Assuming it's already JSON serializable
-    }
+        "incorrect_answers": report.incorrect_answers or [],
+    })
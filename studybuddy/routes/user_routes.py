@@ -1,28 +1,30 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
-from database import get_db
+from database import get_db, get_async_db
 from models.user import User
 from schemas import RegisterRequest
-from utils.utils import create_access_token, hash_password
-from passlib.context import CryptContext
-from dependencies import get_current_user
+from utils.utils import create_access_token, hash_password_async
+from dependencies import get_current_principal
+from utils.token_cache import Principal
+from utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 @router.post("/token", status_code=status.HTTP_200_OK)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Authenticate user and return a JWT token.
     """
     # Fetch user from the database
-    user = User.get_user_by_username(db, form_data.username)
-    if not user or not user.verify_password(form_data.password, user.password):
+    user = await User.get_user_by_username_async(db, form_data.username)
+    if not user or not await user.verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -34,31 +36,31 @@ async def login_for_access_token(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(user: RegisterRequest, db: Session = Depends(get_db)):
+async def register_user(user: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user.
     """
     # Check if the username already exists
-    if User.username_exists(db, user.username):
+    if await User.username_exists_async(db, user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, 
             detail="Username already exists"
         )
     
     # Hash the password and create a new user
-    hashed_password = hash_password(user.password)
-    new_user = User.create_user(db, user.username, hashed_password)
+    hashed_password = await hash_password_async(user.password)
+    new_user = await User.create_user_async(db, user.username, hashed_password)
     
     return {"message": "User registered successfully", "user_id": new_user.id}
 
 @router.post("/login")
-def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """
     Authenticate a user and return a JWT token.
     """
     # Fetch the user from the database
-    user = User.get_user_by_username(db, form_data.username)
-    if not user or not user.verify_password(form_data.password, user.password):
+    user = await User.get_user_by_username_async(db, form_data.username)
+    if not user or not await user.verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -75,32 +77,46 @@ def get_user_profile(user_id: int, db: Session = Depends(get_db)):
     """
     Fetch user details by ID.
     """
-    user = User.get_user_by_id(db, user_id)
-    if not user:
+    profile = User.get_profile(db, user_id)
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, 
             detail="User not found"
         )
     
-    return user.to_dict(db)
+    return profile
 
 @router.get("/", status_code=status.HTTP_200_OK)
-def get_all_users(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_all_users(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
     """
-    Retrieve all users with their creation date, quizzes created, and reports generated.
+    Retrieve users with their creation date, quizzes created, and reports generated.
+    Paginated by user id; pass the X-Next-Cursor response header back as `cursor`.
     Only accessible by admins.
     """
     # Ensure current user has admin privileges (example check)
     if not current_user.is_admin:  # Assuming `is_admin` is a field in the User model
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access forbidden")
 
-    users = db.query(User).all()
-    all_users = [user.to_dict(db) for user in users]
-    return all_users
+    query = User.profile_query().order_by(User.id).limit(limit + 1)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        query = query.where(User.id > after_id)
+    rows = db.execute(query).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].id)
+    return [User.profile_to_dict(row) for row in rows]
 
 @router.get("/me", status_code=status.HTTP_200_OK)
-def get_current_user_details(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_current_user_details(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_principal)):
     """
     Retrieve details about the currently authenticated user.
     """
-    return current_user.to_dict(db)
\ No newline at end of file
+    return User.get_profile(db, current_user.id)
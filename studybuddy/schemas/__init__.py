@@ -1,6 +1,7 @@
 # schemas/__init__.py
 from .answer import AnswerRequest, AnswerResponse
+from .attempt import AttemptAnswer, AttemptRequest
 from .report import ReportRequest, ScoreResponse
 from .user import RegisterRequest
 
-__all__ = ["AnswerRequest", "AnswerResponse", "ReportRequest", "ScoreResponse", "RegisterRequest"]
+__all__ = ["AnswerRequest", "AnswerResponse", "AttemptAnswer", "AttemptRequest", "ReportRequest", "ScoreResponse", "RegisterRequest"]
@@ -0,0 +1,14 @@
+# schemas/attempt.py
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class AttemptAnswer(BaseModel):
+    question: str
+    user_answer: str
+    answered_on: Optional[datetime] = None  # Client clock, when the answer was given
+
+class AttemptRequest(BaseModel):
+    attempt_id: str = Field(min_length=1, max_length=64)  # Client-generated, unique per user
+    started_on: Optional[datetime] = None
+    answers: List[AttemptAnswer] = Field(min_length=1)
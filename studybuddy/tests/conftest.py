@@ -0,0 +1,24 @@
+# tests/conftest.py
+#
+# Run from studybuddy/ with: python -m pytest
+# Every test gets a throwaway SQLite database, so the configured one is never touched.
+
+import pytest
+from models import User
+from utils.benchmark import make_session
+
+
+@pytest.fixture
+def db(tmp_path):
+    session = make_session(str(tmp_path / "test.db"))
+    yield session
+    session.close()
+    session.get_bind().dispose()
+
+
+@pytest.fixture
+def owner(db):
+    user = User(username="owner", password="x")
+    db.add(user)
+    db.commit()
+    return user
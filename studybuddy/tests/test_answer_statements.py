@@ -0,0 +1,94 @@
+"""
+SQL statements and commits per quiz step, counted on the engine.
+Lower a budget when a change saves statements; never raise it to make a test pass.
+"""
+
+import pytest
+from sqlalchemy import event
+from routes.quiz_routes import start_quiz, submit_answer
+from utils.benchmark import make_quiz
+from utils.session_store import session_store
+
+QUIZ_SIZE = 10
+START_STATEMENTS = 17
+# Answering a question for the first time also creates its question_mastery row
+FIRST_ANSWER_STATEMENTS = 10
+REPEAT_ANSWER_STATEMENTS = 7
+COMPLETE_STATEMENTS = 14
+# With the session store, answers between checkpoints stay in memory
+BUFFERED_ANSWER_STATEMENTS = 0
+
+
+@pytest.fixture
+def counted(db):
+    counts = {"statements": 0, "commits": 0}
+
+    def count_statement(*args):
+        counts["statements"] += 1
+
+    def count_commit(*args):
+        counts["commits"] += 1
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(engine, "commit", count_commit)
+
+    def measured(step, **kwargs):
+        counts.update(statements=0, commits=0)
+        result = step(db=db, **kwargs)
+        db.expire_all()  # Each real request starts with a fresh session
+        return result, dict(counts)
+
+    yield measured
+    event.remove(engine, "before_cursor_execute", count_statement)
+    event.remove(engine, "commit", count_commit)
+
+
+def run_session(measured, quiz, user):
+    """Answer every question of a session; returns the counts of the start and of each answer."""
+    session, start = measured(start_quiz, quiz_id=quiz.id, mode="standard", max_questions=None, current_user=user)
+    result, answers = session, []
+    while result["status"] == "in_progress":
+        result, used = measured(
+            submit_answer,
+            quiz_id=quiz.id,
+            report_id=session["report_id"],
+            question=result["next_question"],
+            user_answer="answer",
+        )
+        answers.append(used)
+    assert result["status"] == "completed"
+    return start, answers
+
+
+def test_statements_per_step(db, owner, counted):
+    quiz = make_quiz(db, owner, QUIZ_SIZE)
+    db.expire_all()
+
+    start, answers = run_session(counted, quiz, owner)
+    *answers, complete = answers
+    assert start["statements"] <= START_STATEMENTS and start["commits"] == 1
+    assert max(a["statements"] for a in answers) <= FIRST_ANSWER_STATEMENTS
+    assert all(a["commits"] == 1 for a in answers)
+    assert complete["statements"] <= COMPLETE_STATEMENTS and complete["commits"] == 1
+
+    # The second session finds every question_mastery row in place
+    _, answers = run_session(counted, quiz, owner)
+    assert max(a["statements"] for a in answers[:-1]) <= REPEAT_ANSWER_STATEMENTS
+    assert all(a["commits"] == 1 for a in answers)
+
+
+def test_buffered_answers_skip_the_database(db, owner, counted, monkeypatch):
+    monkeypatch.setattr(session_store, "mode", "memory")
+    monkeypatch.setattr(session_store, "checkpoint_answers", QUIZ_SIZE)
+    quiz = make_quiz(db, owner, QUIZ_SIZE + 1)
+    db.expire_all()
+
+    try:
+        _, answers = run_session(counted, quiz, owner)
+    finally:
+        session_store.crash()  # Drop sessions bound to the test's database
+    buffered = answers[1:QUIZ_SIZE - 1]  # The first answer loads the session, the QUIZ_SIZE-th checkpoints it
+    assert buffered and max(a["statements"] for a in buffered) <= BUFFERED_ANSWER_STATEMENTS
+    assert all(a["commits"] == 0 for a in buffered)
+    assert max(a["commits"] for a in answers) == 1
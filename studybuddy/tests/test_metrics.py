@@ -0,0 +1,50 @@
+"""Request metrics end when the response is sent, not when its background tasks finish."""
+
+import time
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from utils.metrics import MetricsMiddleware, instrument_engine, metrics
+
+BACKGROUND_SECONDS = 0.3
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, "test")
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    def background_work():
+        time.sleep(BACKGROUND_SECONDS)
+        with engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+
+    @app.get("/answer")
+    def answer(background_tasks: BackgroundTasks):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        background_tasks.add_task(background_work)
+        return {"ok": True}
+
+    metrics.reset()
+    yield TestClient(app)
+    metrics.reset()
+    metrics.engines.pop("test", None)
+    metrics.connections_opened.pop("test", None)
+    engine.dispose()
+
+
+def test_background_tasks_are_not_request_time(client):
+    assert client.get("/answer").status_code == 200
+
+    labels = ("GET", "/answer")
+    _, seconds, count = metrics.latency._series[labels]
+    assert count == 1
+    assert seconds < BACKGROUND_SECONDS
+    assert metrics.statements._series[labels][1] == 1
+    assert metrics.background_statements == 3
+    assert metrics.in_flight == 0
@@ -0,0 +1,41 @@
+"""Quiz statistics stay exact under parallel starts and completions."""
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy.orm import sessionmaker
+from models import Quiz
+from utils.benchmark import make_quiz
+from utils.quiz_stats import QuizStatsAccumulator
+
+COMPLETIONS = 2000
+THREADS = 16
+
+
+@pytest.mark.parametrize("mode", ["immediate", "deferred"])
+def test_parallel_completions_lose_no_updates(db, owner, monkeypatch, mode):
+    monkeypatch.setattr("models.quiz.QUIZ_STATS_MODE", mode)
+    # A private accumulator whose background thread never flushes during the test
+    accumulator = QuizStatsAccumulator(flush_seconds=3600)
+    monkeypatch.setattr("models.quiz.quiz_stats", accumulator)
+
+    quiz = make_quiz(db, owner, 10)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    scores = [random.Random(seed).uniform(0, 100) for seed in range(COMPLETIONS)]
+
+    def complete(score):
+        with Session() as session:
+            Quiz.increment_access_count(session, quiz.id)
+            Quiz.record_completion(session, quiz.id, score)
+            session.commit()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        list(pool.map(complete, scores))
+    accumulator.flush(Session)
+
+    db.expire_all()
+    quiz = db.get(Quiz, quiz.id)
+    assert quiz.times_accessed == COMPLETIONS
+    assert quiz.times_completed == COMPLETIONS
+    assert quiz.average_score == pytest.approx(sum(scores) / COMPLETIONS, abs=1e-6)
+    assert quiz.highest_score == max(scores)
@@ -0,0 +1,77 @@
+"""Crash recovery of sessions buffered in the in-memory session store."""
+
+import pytest
+from fastapi import HTTPException
+from models import Report
+from routes.quiz_routes import start_quiz, submit_answer
+from utils.benchmark import make_quiz
+from utils.session_store import session_store
+
+QUIZ_SIZE = 20
+CHECKPOINT_ANSWERS = 5
+
+
+@pytest.fixture
+def memory_store(monkeypatch):
+    monkeypatch.setattr(session_store, "mode", "memory")
+    monkeypatch.setattr(session_store, "checkpoint_answers", CHECKPOINT_ANSWERS)
+    yield session_store
+    session_store.crash()  # Drop sessions bound to the test's database
+
+
+def answer(db, quiz, report_id, question):
+    result = submit_answer(quiz_id=quiz.id, report_id=report_id, question=question, user_answer="answer 0", db=db)
+    db.expire_all()  # Each real request starts with a fresh session
+    return result
+
+
+def test_crash_resumes_from_last_checkpoint(db, owner, memory_store):
+    quiz = make_quiz(db, owner, QUIZ_SIZE)
+    session = start_quiz(quiz_id=quiz.id, mode="standard", max_questions=None, db=db, current_user=owner)
+    report_id, result = session["report_id"], session
+    asked = []
+    for _ in range(2 * CHECKPOINT_ANSWERS + 2):
+        asked.append(result["next_question"])
+        result = answer(db, quiz, report_id, result["next_question"])
+
+    memory_store.crash()
+
+    # The row holds the second checkpoint; the two answers after it are lost
+    report = db.get(Report, report_id)
+    assert report.cursor == 2 * CHECKPOINT_ANSWERS + 1  # Answered plus the one dealt next
+    assert report.total_correct + report.total_incorrect == 2 * CHECKPOINT_ANSWERS
+    assert report.completed_on is None
+
+    # The question dealt at the checkpoint is asked again
+    with pytest.raises(HTTPException) as conflict:
+        answer(db, quiz, report_id, result["next_question"])
+    assert conflict.value.status_code == 409
+    question = conflict.value.detail["current_question"]
+    assert question == asked[2 * CHECKPOINT_ANSWERS]
+
+    while True:
+        result = answer(db, quiz, report_id, question)
+        if result["status"] != "in_progress":
+            break
+        question = result["next_question"]
+
+    # Every question is graded exactly once, whatever was lost in the crash
+    report = db.get(Report, report_id)
+    assert result["status"] == "completed"
+    assert report.completed_on is not None
+    assert report.total_correct + report.total_incorrect == QUIZ_SIZE
+    assert len(report.incorrect_answers) == report.total_incorrect
+
+
+def test_completed_session_survives_crash(db, owner, memory_store):
+    quiz = make_quiz(db, owner, 3)
+    session = start_quiz(quiz_id=quiz.id, mode="standard", max_questions=None, db=db, current_user=owner)
+    result = session
+    while result["status"] == "in_progress":
+        result = answer(db, quiz, session["report_id"], result["next_question"])
+
+    memory_store.crash()
+
+    report = db.get(Report, session["report_id"])
+    assert report.completed_on is not None
+    assert report.total_correct + report.total_incorrect == 3
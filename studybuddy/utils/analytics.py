@@ -0,0 +1,151 @@
+# utils/analytics.py
+#
+# Vectorized per-question statistics for quiz authors, stored in quiz_analytics.
+# Rebuild snapshots by hand with: python -m utils.analytics [quiz_id ...]
+
+import os
+import threading
+from collections import Counter
+
+# Snapshots older than this are refreshed in the background when requested
+ANALYTICS_MAX_AGE_SECONDS = float(os.getenv("ANALYTICS_MAX_AGE_SECONDS", 3600))
+# Seconds suggested to clients polling for a quiz's first snapshot
+ANALYTICS_RETRY_AFTER = 2
+# Questions answered by fewer users get no discrimination index
+MIN_RESPONDENTS = int(os.getenv("ANALYTICS_MIN_RESPONDENTS", 5))
+WRONG_ANSWERS_PER_QUESTION = 5
+
+
+def difficulty(attempts, misses):
+    """Share of answers that were wrong, per question; NaN where nothing was answered."""
+    import numpy as np
+
+    attempts = np.asarray(attempts, dtype=float)
+    misses = np.asarray(misses, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(attempts > 0, misses / attempts, np.nan)
+
+
+def discrimination(user_index, question_index, correct, incorrect, total_questions: int):
+    """
+    Discrimination index per question: the correlation, across users, between a
+    user's accuracy on the question and their accuracy on the rest of the quiz.
+    High values mean the question separates strong learners from weak ones.
+
+    Takes one entry per (user, question) pair, as stored in question_mastery, and
+    computes every question's correlation at once from bincount sums.
+    Returns (index, respondents); the index is NaN below MIN_RESPONDENTS or
+    without variance.
+    """
+    import numpy as np
+
+    user_index = np.asarray(user_index, dtype=np.int64)
+    question_index = np.asarray(question_index, dtype=np.int64)
+    correct = np.asarray(correct, dtype=float)
+    answered = correct + np.asarray(incorrect, dtype=float)
+    if not len(user_index):
+        return np.full(total_questions, np.nan), np.zeros(total_questions, dtype=np.int64)
+
+    # Accuracy on this question and on everything else the user answered
+    user_correct = np.bincount(user_index, weights=correct)
+    user_answered = np.bincount(user_index, weights=answered)
+    rest_answered = user_answered[user_index] - answered
+    has_rest = rest_answered > 0
+    x = (correct / answered)[has_rest]
+    y = ((user_correct[user_index] - correct)[has_rest] / rest_answered[has_rest])
+    q = question_index[has_rest]
+
+    def per_question(values):
+        return np.bincount(q, weights=values, minlength=total_questions)
+
+    n = np.bincount(q, minlength=total_questions).astype(float)
+    sx, sy = per_question(x), per_question(y)
+    sxx, syy, sxy = per_question(x * x), per_question(y * y), per_question(x * y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = n * sxy - sx * sy
+        spread = np.sqrt((n * sxx - sx * sx) * (n * syy - sy * sy))
+        index = np.where((n >= MIN_RESPONDENTS) & (spread > 1e-12), covariance / spread, np.nan)
+    return index, n.astype(np.int64)
+
+
+def common_wrong_answers(incorrect_answer_lists, ordinal_by_prompt: dict, normalize) -> dict:
+    """
+    Count normalized wrong answers per question from reports' incorrect_answers
+    lists. Returns {ordinal: [(answer, count), ...]}, most common first.
+    """
+    counters = {}
+    for incorrect_answers in incorrect_answer_lists:
+        for entry in incorrect_answers or []:
+            ordinal = ordinal_by_prompt.get(entry.get("question"))
+            if ordinal is None:
+                continue
+            counters.setdefault(ordinal, Counter())[normalize(entry.get("user_answer", ""))] += 1
+    return {
+        ordinal: counter.most_common(WRONG_ANSWERS_PER_QUESTION)
+        for ordinal, counter in counters.items()
+    }
+
+
+class RefreshTracker:
+    """Quizzes whose analytics are being rebuilt in this process, so a stale snapshot is rebuilt once."""
+
+    def __init__(self):
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def claim(self, quiz_id: int) -> bool:
+        with self._lock:
+            if quiz_id in self._running:
+                return False
+            self._running.add(quiz_id)
+            return True
+
+    def release(self, quiz_id: int):
+        with self._lock:
+            self._running.discard(quiz_id)
+
+
+refreshing = RefreshTracker()
+
+
+def refresh_analytics(quiz_id: int, session_factory=None):
+    """Rebuild one quiz's snapshot in its own session; used as a background task."""
+    from sqlalchemy.exc import IntegrityError
+    from database import SessionLocal
+    from models import QuizAnalytics
+
+    session_factory = session_factory or SessionLocal
+    try:
+        with session_factory() as db:
+            try:
+                QuizAnalytics.rebuild(db, quiz_id)
+                db.commit()
+            except IntegrityError:
+                # Another worker stored the first snapshot concurrently
+                db.rollback()
+            except Exception as e:
+                db.rollback()
+                print(f"Error rebuilding analytics for quiz {quiz_id}: {e}")
+    finally:
+        refreshing.release(quiz_id)
+
+
+def rebuild_analytics(quiz_ids: list = None):
+    """
+    Rebuild analytics snapshots for the given quizzes, or for every quiz.
+    """
+    from database import SessionLocal
+    from models import Quiz, QuizAnalytics
+
+    with SessionLocal() as db:
+        quiz_ids = quiz_ids or [quiz_id for (quiz_id,) in db.query(Quiz.id).all()]
+        for quiz_id in quiz_ids:
+            analytics = QuizAnalytics.rebuild(db, quiz_id)
+            db.commit()
+            print(f"Rebuilt analytics for quiz {quiz_id}: {analytics.answers_logged} answers")
+
+
+if __name__ == "__main__":
+    import sys
+
+    rebuild_analytics([int(arg) for arg in sys.argv[1:]])
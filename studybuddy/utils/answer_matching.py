@@ -0,0 +1,139 @@
+# utils/answer_matching.py
+#
+# Answer normalization and matching. Stored answers are normalized once, at
+# upload, into questions.accepted_answers; a submission is normalized once and
+# compared against those, optionally with a bounded number of typos.
+
+import os
+import unicodedata
+
+# Separates alternative answers within one CSV cell, e.g. "colour|color"
+ANSWER_DELIMITER = os.getenv("ANSWER_DELIMITER", "|")
+# Highest per-quiz fuzzy tolerance (edits) that can be configured
+MAX_FUZZY_TOLERANCE = 3
+# An answer needs this many characters per allowed edit, so short answers stay exact
+CHARS_PER_EDIT = 4
+
+
+# Punctuation that only shapes a sentence (stops, quotes, brackets) and is
+# treated as whitespace. Signs and symbols such as - + # % / stay significant,
+# so "-5" differs from "5" and "C++" from "C".
+SOFT_PUNCTUATION = ".,;:!?\"'`()[]{}"
+# Unicode punctuation categories that are soft as well: brackets and quotes
+_SOFT_CATEGORIES = {"Ps", "Pe", "Pi", "Pf"}
+_SOFT_TRANSLATION = str.maketrans({c: " " for c in SOFT_PUNCTUATION})
+_UNICODE_SOFT = set(SOFT_PUNCTUATION) | set("¡¿…。、")
+
+
+def normalize_answer(text) -> str:
+    """
+    Normalize an answer for comparison: Unicode NFKC, case folding, accents
+    removed, soft punctuation treated as whitespace and whitespace collapsed.
+    An answer made only of soft punctuation keeps its casefolded text, so it
+    never normalizes to the same empty string as a blank answer.
+    """
+    text = str(text)
+    if text.isascii():
+        # Nothing to compose, fold or strip accents from
+        normalized = " ".join(text.lower().translate(_SOFT_TRANSLATION).split())
+        return normalized or " ".join(text.lower().split())
+    text = unicodedata.normalize("NFKC", text).casefold()
+    decomposed = unicodedata.normalize("NFD", text)
+    folded = []
+    for char in decomposed:
+        category = unicodedata.category(char)
+        if category == "Mn":
+            continue  # Combining accent
+        soft = category[0] == "Z" or category in _SOFT_CATEGORIES or char in _UNICODE_SOFT
+        folded.append(" " if soft else char)
+    return " ".join("".join(folded).split()) or " ".join(text.split())
+
+
+def accepted_answers(answer: str) -> list:
+    """
+    The normalized forms of every alternative in a stored answer, without
+    duplicates. Blank alternatives are dropped; a blank answer accepts nothing.
+    """
+    accepted = []
+    for alternative in str(answer).split(ANSWER_DELIMITER):
+        normalized = normalize_answer(alternative)
+        if normalized and normalized not in accepted:
+            accepted.append(normalized)
+    return accepted
+
+
+def display_answer(answer: str) -> str:
+    """The answer shown to learners and kept in reports: the first alternative as written."""
+    for alternative in str(answer).split(ANSWER_DELIMITER):
+        if alternative.strip():
+            return alternative.strip()
+    return str(answer).strip()
+
+
+def allowed_edits(expected: str, tolerance: int) -> int:
+    """Edits tolerated against an expected answer: the quiz tolerance, scaled down for short answers."""
+    return min(tolerance, len(expected) // CHARS_PER_EDIT)
+
+
+def within_distance(a: str, b: str, max_distance: int) -> bool:
+    """
+    Check whether a and b are at most max_distance edits apart. Edits are
+    insertions, deletions, substitutions and swaps of two adjacent characters
+    (Levenshtein distance with transpositions, optimal string alignment).
+
+    Only the diagonal band of width 2 * max_distance + 1 of the edit matrix is
+    filled, and the scan stops as soon as a whole row exceeds the bound, so the
+    cost is O(len * max_distance) at worst and usually far less.
+    """
+    if a == b:
+        return True
+    if max_distance <= 0 or abs(len(a) - len(b)) > max_distance:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+
+    too_far = max_distance + 1
+    before = None
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [too_far] * (len(b) + 1)
+        current[0] = i if i <= max_distance else too_far
+        row_best = current[0]
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if (
+                before is not None and j > 1
+                and char == b[j - 2] and a[i - 2] == b[j - 1]
+                and before[j - 2] + 1 < cost
+            ):
+                cost = before[j - 2] + 1
+            current[j] = cost
+            if cost < row_best:
+                row_best = cost
+        if row_best > max_distance:
+            return False
+        before, previous = previous, current
+    return previous[len(b)] <= max_distance
+
+
+def answer_matches(user_answer, accepted: list, tolerance: int = 0) -> bool:
+    """
+    Check a submitted answer against a question's accepted answers.
+    Exact matches of the normalized forms are tried first; with a tolerance,
+    answers within the allowed number of edits of an alternative also match.
+    """
+    given = normalize_answer(user_answer)
+    if not given:
+        return False
+    if given in accepted:
+        return True
+    if tolerance > 0:
+        return any(within_distance(given, expected, allowed_edits(expected, tolerance)) for expected in accepted)
+    return False
@@ -0,0 +1,839 @@
+# utils/benchmark.py
+#
+# Micro-benchmarks for the quiz hot paths. Each benchmark runs against a
+# throwaway SQLite database, so it never touches the configured one.
+#
+#   python -m utils.benchmark next-question
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from sqlalchemy.orm import sessionmaker
+from database import Base, build_engine, SQLITE_PROFILE
+from models import User, Quiz
+
+
+def make_session(path: str, profile: str = SQLITE_PROFILE):
+    """Create a fresh schema in a temporary SQLite file and return a session."""
+    engine = build_engine(f"sqlite:///{path}", profile)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def make_quiz(db, owner: User, size: int, name: str = None) -> Quiz:
+    """Create a quiz with `size` generated questions."""
+    quiz = Quiz(name=name or f"bench-{size}", created_by=owner.id)
+    quiz.set_questions({f"question {i}": f"answer {i}" for i in range(size)})
+    db.add(quiz)
+    db.commit()
+    return quiz
+
+
+def bench_next_question(sizes=(50, 500, 5000, 50000), answers: int = 200):
+    """
+    Per-answer latency of submit_answer as the quiz grows.
+    With the shuffled deck it should stay flat across quiz sizes.
+    """
+    from routes.quiz_routes import start_quiz, submit_answer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(os.path.join(tmp, "bench.db"))
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+
+        print(f"{'questions':>10} {'mean ms':>10} {'p95 ms':>10}")
+        for size in sizes:
+            quiz = make_quiz(db, owner, size)
+            session = start_quiz(quiz_id=quiz.id, mode="standard", max_questions=None, db=db, current_user=owner)
+            question = session["next_question"]
+            timings = []
+            for _ in range(min(answers, size - 1)):
+                start = time.perf_counter()
+                result = submit_answer(
+                    quiz_id=quiz.id,
+                    report_id=session["report_id"],
+                    question=question,
+                    user_answer="answer",
+                    db=db,
+                )
+                timings.append((time.perf_counter() - start) * 1000)
+                question = result["next_question"]
+                db.expire_all()  # Each real request starts with a fresh session
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{size:>10} {statistics.mean(timings):>10.3f} {p95:>10.3f}")
+
+
+def bench_quiz_stats(completions: int = 4000, threads: int = 16):
+    """
+    Thousands of parallel starts and completions against one quiz.
+    Checks that the atomic statistic updates lose nothing.
+    """
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from utils.quiz_stats import quiz_stats
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(os.path.join(tmp, "bench.db"))
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        quiz = make_quiz(db, owner, 10)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+        scores = [random.uniform(0, 100) for _ in range(completions)]
+
+        def complete(score):
+            with Session() as session:
+                Quiz.increment_access_count(session, quiz.id)
+                Quiz.record_completion(session, quiz.id, score)
+                session.commit()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(complete, scores))
+        quiz_stats.flush(Session)  # No-op unless QUIZ_STATS_MODE=deferred
+        elapsed = time.perf_counter() - start
+
+        db.expire_all()
+        quiz = db.get(Quiz, quiz.id)
+        expected_average = sum(scores) / len(scores)
+        print(f"{completions} completions on {threads} threads in {elapsed:.2f}s "
+              f"({completions / elapsed:.0f}/s)")
+        print(f"times_accessed  {quiz.times_accessed} (expected {completions})")
+        print(f"times_completed {quiz.times_completed} (expected {completions})")
+        print(f"average_score   {quiz.average_score:.6f} (expected {expected_average:.6f})")
+        print(f"highest_score   {quiz.highest_score:.6f} (expected {max(scores):.6f})")
+        assert quiz.times_accessed == completions
+        assert quiz.times_completed == completions
+        assert abs(quiz.average_score - expected_average) < 1e-6
+        assert quiz.highest_score == max(scores)
+
+
+def _quiz_session_worker(args):
+    """Run complete quiz sessions in one process, like one uvicorn worker."""
+    from routes.quiz_routes import start_quiz, submit_answer
+
+    path, profile, user_id, quiz_id, sessions = args
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=build_engine(f"sqlite:///{path}", profile))
+    learner = User(id=user_id)
+    requests = 0
+    for _ in range(sessions):
+        with Session() as db:
+            session = start_quiz(quiz_id=quiz_id, mode="standard", max_questions=None, db=db, current_user=learner)
+        requests += 1
+        result = session
+        while result.get("status") == "in_progress":
+            with Session() as db:
+                result = submit_answer(
+                    quiz_id=quiz_id,
+                    report_id=session["report_id"],
+                    question=result["next_question"],
+                    user_answer="answer",
+                    db=db,
+                )
+            requests += 1
+    return requests
+
+
+def bench_db_profiles(workers: int = 4, sessions: int = 25, quiz_size: int = 20):
+    """
+    Concurrent start/submit throughput for each SQLite profile, one process per worker.
+    """
+    from multiprocessing import Pool
+
+    print(f"{'profile':>10} {'requests':>10} {'seconds':>10} {'req/s':>10}")
+    for profile in ("default", "wal"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            db = make_session(path, profile)
+            owner = User(username="bench", password="x")
+            db.add(owner)
+            db.commit()
+            quiz = make_quiz(db, owner, quiz_size)
+            jobs = [(path, profile, owner.id, quiz.id, sessions)] * workers
+            db.close()
+
+            start = time.perf_counter()
+            with Pool(workers) as pool:
+                requests = sum(pool.map(_quiz_session_worker, jobs))
+            elapsed = time.perf_counter() - start
+            print(f"{profile:>10} {requests:>10} {elapsed:>10.2f} {requests / elapsed:>10.0f}")
+
+
+def bench_answer_statements(size: int = 20):
+    """
+    SQL statements and commits issued per start and per answer over one session.
+    Each answer step should cost a handful of statements and at most one commit;
+    tests/test_answer_statements.py enforces the budgets.
+    """
+    from sqlalchemy import event
+    from routes.quiz_routes import start_quiz, submit_answer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(os.path.join(tmp, "bench.db"))
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        quiz = make_quiz(db, owner, size)
+        db.expire_all()
+
+        counts = {"statements": 0, "commits": 0}
+        engine = db.get_bind()
+
+        def count_statement(*args):
+            counts["statements"] += 1
+
+        def count_commit(*args):
+            counts["commits"] += 1
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        event.listen(engine, "commit", count_commit)
+
+        def measured(step, **kwargs):
+            counts.update(statements=0, commits=0)
+            result = step(db=db, **kwargs)
+            db.expire_all()
+            return result, dict(counts)
+
+        print(f"{'step':>10} {'statements':>12} {'commits':>10}")
+        session, used = measured(start_quiz, quiz_id=quiz.id, mode="standard", max_questions=None, current_user=owner)
+        print(f"{'start':>10} {used['statements']:>12} {used['commits']:>10}")
+        result, answers = session, []
+        while result.get("status") == "in_progress":
+            result, used = measured(
+                submit_answer,
+                quiz_id=quiz.id,
+                report_id=session["report_id"],
+                question=result["next_question"],
+                user_answer="answer",
+            )
+            answers.append(used)
+        last = answers.pop()
+        print(f"{'answer':>10} {statistics.mean(a['statements'] for a in answers):>12.1f} "
+              f"{max(a['commits'] for a in answers):>10}")
+        print(f"{'complete':>10} {last['statements']:>12} {last['commits']:>10}")
+        # Buffered answers (SESSION_STORE=memory) commit nothing until a checkpoint
+        assert all(a["commits"] <= 1 for a in answers + [last])
+
+
+def bench_session_store(size: int = 200, checkpoint_answers: int = 10):
+    """
+    Bytes written to the reports table per session with and without the session
+    store, then a simulated worker crash mid-session to check recovery.
+    """
+    from fastapi import HTTPException
+    from sqlalchemy import event
+    from routes.quiz_routes import start_quiz, submit_answer
+    from utils.session_store import session_store
+
+    def run_session(db, quiz, crash_after: int = None):
+        session = start_quiz(quiz_id=quiz.id, mode="standard", max_questions=None, db=db, current_user=owner)
+        result, question, answered = session, session["next_question"], 0
+        while result.get("status") == "in_progress":
+            if answered == crash_after:
+                session_store.crash()
+            try:
+                result = submit_answer(
+                    quiz_id=quiz.id,
+                    report_id=session["report_id"],
+                    question=question,
+                    user_answer="answer 0",
+                    db=db,
+                )
+            except HTTPException as e:
+                # Recovered from the last checkpoint: answer the question it is waiting on
+                assert e.status_code == 409, e.detail
+                question = e.detail["current_question"]
+                continue
+            answered += 1
+            question = result.get("next_question")
+            db.expire_all()
+        return session["report_id"], answered, result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(os.path.join(tmp, "bench.db"))
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        quiz = make_quiz(db, owner, size)
+
+        written = {"statements": 0, "bytes": 0}
+
+        def count_report_writes(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("UPDATE reports"):
+                written["statements"] += 1
+                written["bytes"] += len(repr(parameters))
+
+        event.listen(db.get_bind(), "before_cursor_execute", count_report_writes)
+        saved_mode, saved_every = session_store.mode, session_store.checkpoint_answers
+        try:
+            print(f"{'store':>8} {'answers':>8} {'updates':>8} {'bytes':>10}")
+            for mode in ("off", "memory"):
+                session_store.mode, session_store.checkpoint_answers = mode, checkpoint_answers
+                written.update(statements=0, bytes=0)
+                _, answered, _ = run_session(db, quiz)
+                print(f"{mode:>8} {answered:>8} {written['statements']:>8} {written['bytes']:>10}")
+
+            crash_after = checkpoint_answers * 2 + checkpoint_answers // 2
+            report_id, answered, result = run_session(db, quiz, crash_after=crash_after)
+            from models import Report
+            report = db.get(Report, report_id)
+            print(f"crash after {crash_after} answers: {answered} answers accepted, "
+                  f"{result['total_correct'] + result['total_incorrect']} graded, score {result['score']}")
+            # Every question is graded exactly once, whatever was lost in the crash
+            assert report.completed_on is not None
+            assert report.total_correct + report.total_incorrect == size
+            assert answered == size + crash_after % checkpoint_answers
+        finally:
+            session_store.mode, session_store.checkpoint_answers = saved_mode, saved_every
+
+
+def bench_analytics(users: int = 2000, questions: int = 50):
+    """
+    Rebuild and serve quiz analytics for users x questions logged answers
+    (100k by default), with answers simulated from a one-parameter IRT model.
+    """
+    import json
+    import numpy as np
+    from datetime import datetime
+    from fastapi import BackgroundTasks
+    from sqlalchemy import bindparam
+    from models import Question, QuestionMastery, Report, QuizAnalytics
+    from routes.quiz_routes import get_quiz_analytics
+    from utils.token_cache import Principal
+
+    rng = np.random.default_rng(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = make_session(os.path.join(tmp, "bench.db"))
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        quiz = make_quiz(db, owner, questions)
+        db.execute(User.__table__.insert(), [
+            {"username": f"learner {i}", "password": "x"} for i in range(users)
+        ])
+        user_ids = [user_id for (user_id,) in db.query(User.id).filter(User.id != owner.id).all()]
+        question_rows = db.query(Question.id, Question.prompt, Question.answer).filter(
+            Question.quiz_id == quiz.id
+        ).order_by(Question.ordinal).all()
+
+        ability = rng.normal(0, 1, users)
+        hardness = rng.normal(0, 1, questions)
+        correct = rng.random((users, questions)) < 1 / (1 + np.exp(hardness[None, :] - ability[:, None]))
+        now = datetime.utcnow()
+        db.execute(QuestionMastery.__table__.insert(), [
+            {
+                "user_id": user_ids[u], "question_id": question_rows[q].id, "quiz_id": quiz.id,
+                "correct_count": int(correct[u, q]), "incorrect_count": int(not correct[u, q]),
+                "streak": int(correct[u, q]), "last_seen": now, "next_due": now,
+            }
+            for u in range(users) for q in range(questions)
+        ])
+        misses = (~correct).sum(axis=0)
+        db.execute(
+            Question.__table__.update().where(Question.__table__.c.id == bindparam("qid")).values(
+                attempt_count=bindparam("attempts"), miss_count=bindparam("misses")
+            ),
+            [
+                {"qid": row.id, "attempts": users, "misses": int(misses[q])}
+                for q, row in enumerate(question_rows)
+            ],
+        )
+        db.execute(Report.__table__.insert(), [
+            {
+                "user_id": user_ids[u], "quiz_id": quiz.id, "started_on": now, "completed_on": now,
+                "total_correct": int(correct[u].sum()), "total_incorrect": int((~correct[u]).sum()),
+                "incorrect_answers": [
+                    {"question": question_rows[q].prompt, "user_answer": f"guess {rng.integers(3)}",
+                     "correct_answer": question_rows[q].answer}
+                    for q in np.flatnonzero(~correct[u])
+                ],
+                "asked_questions": [], "cursor": questions, "version": 1, "mode": "standard",
+            }
+            for u in range(users)
+        ])
+        db.commit()
+
+        start = time.perf_counter()
+        QuizAnalytics.rebuild(db, quiz.id)
+        db.commit()
+        rebuild_ms = (time.perf_counter() - start) * 1000
+
+        author = Principal(id=owner.id, username=owner.username, is_admin=False)
+        timings = []
+        for _ in range(50):
+            db.expire_all()
+            start = time.perf_counter()
+            result = get_quiz_analytics(quiz.id, BackgroundTasks(), limit=50, db=db, current_user=author)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        entries = json.loads(result.body)["questions"]
+        measured = {e["ordinal"]: e for e in entries}
+        correlation = np.corrcoef(hardness, [measured[q]["difficulty"] for q in range(questions)])[0, 1]
+        print(f"{users * questions} logged answers, {questions} questions")
+        print(f"rebuild     {rebuild_ms:10.1f} ms")
+        print(f"serve mean  {statistics.mean(timings):10.2f} ms")
+        print(f"serve p95   {statistics.quantiles(timings, n=20)[-1]:10.2f} ms")
+        print(f"difficulty vs simulated hardness r={correlation:.3f}")
+        print(f"median discrimination {np.median([e['discrimination'] for e in entries]):.3f}")
+
+
+def bench_answer_matching(rounds: int = 20000):
+    """
+    Grading hot path: exact and fuzzy matching against precomputed accepted
+    answers, versus re-normalizing the stored answer on every submission.
+    """
+    import random
+    from utils.answer_matching import accepted_answers, answer_matches, normalize_answer
+
+    rng = random.Random(7)
+    words = [
+        "bibliothèque", "Schmetterling", "mariposa | papillon", "Krankenhaus",
+        "desenvolvimento", "Straße", "œuvre", "entrepreneur", "pomme de terre", "Geschwindigkeit",
+    ]
+
+    def typo(word: str) -> str:
+        i = rng.randrange(len(word) - 1)
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+    answers = [rng.choice(words) for _ in range(rounds)]
+    submissions = []
+    for answer in answers:
+        first = answer.split("|")[0].strip()
+        submissions.append(rng.choice([first, first.upper(), typo(first), "wrong answer"]))
+    accepted = {answer: accepted_answers(answer) for answer in set(answers)}
+
+    def timed(label, grade):
+        start = time.perf_counter()
+        hits = sum(grade(answer, given) for answer, given in zip(answers, submissions))
+        elapsed = time.perf_counter() - start
+        print(f"{label:>28} {elapsed / rounds * 1e6:>8.2f} us {hits / rounds:>8.1%} accepted")
+
+    print(f"{'matcher':>28} {'per answer':>11} {'accepted':>17}")
+    timed("strip/lower (before)", lambda a, g: str(g).strip().lower() == str(a).strip().lower())
+    timed("normalize both each time", lambda a, g: normalize_answer(g) in accepted_answers(a))
+    timed("precomputed, exact", lambda a, g: answer_matches(g, accepted[a], 0))
+    timed("precomputed, tolerance 1", lambda a, g: answer_matches(g, accepted[a], 1))
+    timed("precomputed, tolerance 2", lambda a, g: answer_matches(g, accepted[a], 2))
+
+
+def bench_catalogue(quizzes: int = 500, requests: int = 200):
+    """
+    GET /quizzes/ and GET /quizzes/{id}: uncached, served from the response
+    cache, and answered with 304 for a matching If-None-Match.
+    """
+    import asyncio
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from starlette.requests import Request
+    from database import to_async_url, engine_options
+    from routes.quiz_routes import list_all_quizzes, get_quiz_details
+    from utils.response_cache import response_cache
+
+    def request(etag: str = None) -> Request:
+        headers = [(b"if-none-match", etag.encode())] if etag else []
+        return Request({"type": "http", "method": "GET", "headers": headers})
+
+    async def measure(db, label, handler, etag=None, clear=False):
+        statements[0] = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            if clear:
+                response_cache.clear()
+            response = await handler(request(etag), db)
+        elapsed = (time.perf_counter() - start) / requests * 1000
+        print(f"{label:>22} {elapsed:>9.3f} ms {statements[0] / requests:>11.1f} {response.status_code:>7}")
+        return response
+
+    async def run(path):
+        url = f"sqlite:///{path}"
+        engine = create_async_engine(to_async_url(url), **engine_options(url))
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            for name, handler in [
+                ("list", lambda r, db: list_all_quizzes(r, db)),
+                ("detail", lambda r, db: get_quiz_details(quiz_id, r, db)),
+            ]:
+                await measure(db, f"{name} uncached", handler, clear=True)
+                response = await measure(db, f"{name} cached", handler)
+                await measure(db, f"{name} 304", handler, etag=response.headers["etag"])
+        await engine.dispose()
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = make_session(path)
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        for i in range(quizzes):
+            quiz_id = make_quiz(db, owner, 20, name=f"bench quiz {i}").id
+        db.close()
+        print(f"{quizzes} quizzes, {requests} requests each")
+        print(f"{'request':>22} {'per request':>12} {'statements':>11} {'status':>7}")
+        asyncio.run(run(path))
+
+
+def bench_search(quizzes: int = 100_000, questions: int = 5, vocabulary: int = 20_000):
+    """
+    GET /quizzes/search over `quizzes` quizzes of generated text with a Zipf-like
+    word distribution, from rare to very common terms, plus a deep page.
+    The matches column counts every match; broad queries rank only SEARCH_MAX_RANKED
+    and are marked truncated.
+    """
+    import asyncio
+    import itertools
+    import random
+    from datetime import datetime
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from database import to_async_url, engine_options
+    from models import Question
+    from utils.search import create_search_index, match_expression, search_quizzes
+
+    rng = random.Random(7)
+    words = [f"w{i:05d}x" for i in range(vocabulary)]
+    cumulative = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary)))
+
+    def sentence(length: int) -> str:
+        return " ".join(rng.choices(words, cum_weights=cumulative, k=length))
+
+    async def run(url):
+        engine = create_async_engine(to_async_url(url), **engine_options(url))
+        async with async_sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            print(f"{'query':>24} {'matches':>9} {'first page':>11} {'page 20':>9} {'truncated':>10}")
+            for label, q in [
+                ("rare word", words[-1]),
+                ("common word", words[50]),
+                ("most common word", words[0]),
+                ("two words", f"{words[3]} {words[40]}"),
+                ("4-letter prefix", words[120][:4]),
+            ]:
+                timings = []
+                for _ in range(20):
+                    start = time.perf_counter()
+                    rows, next_key, truncated = await search_quizzes(db, q, 20)
+                    timings.append((time.perf_counter() - start) * 1000)
+                pages, deep_timings = 0, []
+                while next_key and pages < 19:
+                    start = time.perf_counter()
+                    rows, next_key, _ = await search_quizzes(db, q, 20, next_key)
+                    deep_timings.append((time.perf_counter() - start) * 1000)
+                    pages += 1
+                matches = (await db.execute(
+                    text("SELECT count(*) FROM quiz_search WHERE quiz_search MATCH :m"),
+                    {"m": match_expression(q.split())},
+                )).scalar()
+                deep = f"{deep_timings[-1]:7.2f}ms" if pages == 19 else f"{'-':>9}"
+                print(f"{label:>24} {matches:>9} {statistics.median(timings):9.2f}ms {deep} {str(truncated):>10}")
+        await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = make_session(path)
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        now = datetime.utcnow()
+        for first in range(0, quizzes, 10_000):
+            ids = range(first + 1, min(first + 10_000, quizzes) + 1)
+            db.execute(Quiz.__table__.insert(), [
+                {"id": i, "name": f"quiz {i} {sentence(3)}", "created_by": owner.id, "created_on": now,
+                 "total_questions": questions, "fuzzy_tolerance": 0}
+                for i in ids
+            ])
+            db.execute(Question.__table__.insert(), [
+                {"quiz_id": i, "ordinal": n, "prompt": sentence(8), "answer": sentence(2)}
+                for i in ids for n in range(questions)
+            ])
+        db.commit()
+        db.close()
+
+        start = time.perf_counter()
+        create_search_index(db.get_bind())
+        print(f"index build {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(path) / 1e6:.0f} MB database")
+        asyncio.run(run(f"sqlite:///{path}"))
+
+
+def bench_serialization(reports: int = 10_000, misses: int = 8, rounds: int = 5):
+    """
+    Encode a 10k-report history: FastAPI's response_model path, the streamed
+    json.dumps path the report listings used, and the orjson paths.
+    """
+    import asyncio
+    import json
+    import random
+    from datetime import datetime, timedelta
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from schemas import ScoreResponse
+    from utils.pagination import stream_json_array
+    from utils.serialization import TrustedJSONResponse
+
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(reports):
+        started_on = start + timedelta(minutes=i, microseconds=rng.randrange(1_000_000))
+        rows.append({
+            "quiz_name": f"quiz {i % 50}",
+            "started_on": started_on,
+            "completed_on": started_on + timedelta(minutes=5),
+            "score": round(rng.random() * 100, 2),
+            "total_correct": 20 - misses,
+            "total_incorrect": misses,
+            "incorrect_answers": [
+                {"question": f"question {rng.randrange(500)}", "user_answer": f"guess {n}",
+                 "correct_answer": f"answer {n}"}
+                for n in range(misses)
+            ],
+        })
+    # The response_model routes returned ISO strings, as ScoreResponse declares
+    iso_rows = [
+        {**row, "started_on": row["started_on"].isoformat(), "completed_on": row["completed_on"].isoformat()}
+        for row in rows
+    ]
+    field = create_model_field(name="Response", type_=List[ScoreResponse], mode="serialization")
+
+    def validated():
+        content = asyncio.run(serialize_response(field=field, response_content=iso_rows))
+        return JSONResponse(content).body
+
+    paths = [
+        ("response_model + json", validated),
+        ("jsonable_encoder + json", lambda: JSONResponse(jsonable_encoder(rows)).body),
+        ("jsonable_encoder + orjson", lambda: ORJSONResponse(jsonable_encoder(rows)).body),
+        ("streamed json.dumps (before)", lambda: b"".join(
+            json.dumps(row, default=str).encode("utf-8") for row in rows
+        )),
+        ("streamed orjson", lambda: b"".join(stream_json_array(rows))),
+        ("trusted orjson", lambda: TrustedJSONResponse(rows).body),
+    ]
+    print(f"{reports} reports, {misses} incorrect answers each")
+    print(f"{'path':>28} {'time':>9} {'size':>9}")
+    for label, encode in paths:
+        timings = []
+        for _ in range(rounds):
+            began = time.perf_counter()
+            body = encode()
+            timings.append((time.perf_counter() - began) * 1000)
+        print(f"{label:>28} {min(timings):7.1f}ms {len(body) / 1e6:7.2f}MB")
+
+
+STARTUP_WORKER = """
+import json, sys, time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    ready = time.perf_counter()
+    status = client.get("/quizzes/").status_code
+answered = time.perf_counter()
+print(json.dumps({
+    "import": imported - started, "lifespan": ready - imported, "first_request": answered - started,
+    "status": status, "passlib_loaded": "passlib" in sys.modules, "pandas_loaded": "pandas" in sys.modules,
+}))
+"""
+
+
+def bench_startup(workers: int = 4):
+    """
+    Worker cold start in fresh processes: import time, lifespan time and time
+    to the first response, for an empty database, a restart that has to
+    initialize again (what every start used to cost) and a plain restart.
+    Then `workers` processes start at once on an empty database.
+    """
+    import json
+    import subprocess
+    import sys
+    from sqlalchemy import create_engine, text
+
+    def start_workers(path: str, count: int) -> list:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "PYTHONPATH": os.getcwd()}
+        processes = [
+            subprocess.Popen([sys.executable, "-c", STARTUP_WORKER], env=env, cwd=os.path.dirname(path),
+                             stdout=subprocess.PIPE, text=True)
+            for _ in range(count)
+        ]
+        results = []
+        for process in processes:
+            output = process.communicate()[0].splitlines()
+            result = json.loads(output[-1])
+            result["initialized"] = any(line.startswith("Initialized the database") for line in output)
+            results.append(result)
+        return results
+
+    def show(label: str, result: dict):
+        print(f"{label:>28} {result['import'] * 1000:8.0f}ms {result['lifespan'] * 1000:8.0f}ms "
+              f"{result['first_request'] * 1000:8.0f}ms {'yes' if result['initialized'] else 'no':>6}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        print(f"{'start':>28} {'import':>10} {'lifespan':>10} {'first req':>10} {'init':>6}")
+        show("empty database", start_workers(path, 1)[0])
+        engine = create_engine(f"sqlite:///{path}")
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM schema_info"))
+        engine.dispose()
+        show("restart, initializing", start_workers(path, 1)[0])
+        result = start_workers(path, 1)[0]
+        show("restart, already current", result)
+        print(f"passlib loaded: {result['passlib_loaded']}, pandas loaded: {result['pandas_loaded']}")
+
+        path = os.path.join(tmp, "concurrent.db")
+        results = start_workers(path, workers)
+        print(f"{workers} workers on an empty database: "
+              f"{sum(r['initialized'] for r in results)} initialized, "
+              f"statuses {sorted(r['status'] for r in results)}, "
+              f"slowest first response {max(r['first_request'] for r in results) * 1000:.0f}ms")
+
+
+METRICS_WORKER = """
+import asyncio, json, sys, time
+import main
+from utils.metrics import metrics
+from utils.startup import initialize_once
+
+requests, rounds = int(sys.argv[1]), int(sys.argv[2])
+paths = json.loads(sys.argv[3])
+initialize_once()
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def call(target):
+    path, _, query = target.partition("?")
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await main.app({
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }, receive, send)
+    return statuses[0]
+
+
+async def run():
+    timings = {path: {"off": [], "on": []} for path in paths}
+    statuses = {path: await call(path) for path in paths}  # Warm caches and pools
+    for _ in range(rounds):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            for path in paths:
+                started = time.perf_counter()
+                for _ in range(requests):
+                    await call(path)
+                timings[path]["on" if enabled else "off"].append((time.perf_counter() - started) / requests)
+    started = time.perf_counter()
+    body = metrics.render()
+    return timings, statuses, time.perf_counter() - started, len(body)
+
+
+timings, statuses, render_seconds, render_bytes = asyncio.run(run())
+print(json.dumps({"timings": timings, "statuses": statuses, "render": render_seconds, "render_bytes": render_bytes}))
+"""
+
+
+def bench_metrics(requests: int = 500, rounds: int = 5, quizzes: int = 50):
+    """
+    Overhead of the metrics middleware: the middleware alone around an empty
+    ASGI app, then real routes through the whole app with metrics off and on,
+    alternating rounds in one process.
+    """
+    import asyncio
+    import json
+    import subprocess
+    import sys
+    from models import Report
+    from utils.metrics import MetricsMiddleware, metrics
+
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    async def time_app(app, count: int) -> float:
+        scope = {"type": "http", "method": "GET", "path": "/"}
+        started = time.perf_counter()
+        for _ in range(count):
+            await app(dict(scope), None, send)
+        return (time.perf_counter() - started) / count
+
+    async def middleware_overhead(count: int = 100_000) -> float:
+        wrapped = MetricsMiddleware(empty_app)
+        bare = min([await time_app(empty_app, count) for _ in range(rounds)])
+        metrics.enabled = True
+        instrumented = min([await time_app(wrapped, count) for _ in range(rounds)])
+        metrics.reset()
+        return instrumented - bare
+
+    print(f"middleware alone: {asyncio.run(middleware_overhead()) * 1e6:.1f}us per request")
+
+    paths = ["/quizzes/", "/quizzes/1", "/quizzes/search?q=bench", "/reports/1", "/users/profile/1"]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = make_session(path)
+        owner = User(username="bench", password="x")
+        db.add(owner)
+        db.commit()
+        for i in range(quizzes):
+            quiz = make_quiz(db, owner, 20, name=f"bench quiz {i}")
+        db.add(Report(user_id=owner.id, quiz_id=quiz.id, score=80.0, total_correct=16, total_incorrect=4))
+        db.commit()
+        db.close()
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "PYTHONPATH": os.getcwd()}
+        output = subprocess.run(
+            [sys.executable, "-c", METRICS_WORKER, str(requests), str(rounds), json.dumps(paths)],
+            env=env, cwd=tmp, stdout=subprocess.PIPE, text=True, check=True,
+        ).stdout.splitlines()
+    result = json.loads(output[-1])
+
+    print(f"{requests} requests x {rounds} rounds per route, best round")
+    print(f"{'route':>26} {'status':>7} {'off':>10} {'on':>10} {'overhead':>10}")
+    for route, timing in result["timings"].items():
+        off, on = min(timing["off"]), min(timing["on"])
+        print(f"{route:>26} {result['statuses'][route]:>7} {off * 1e6:>8.0f}us {on * 1e6:>8.0f}us "
+              f"{(on - off) / off * 100:>9.1f}%")
+    print(f"rendering /metrics: {result['render'] * 1000:.2f}ms, {result['render_bytes'] / 1024:.0f}KiB")
+
+
+BENCHMARKS = {
+    "next-question": bench_next_question,
+    "quiz-stats": bench_quiz_stats,
+    "db-profiles": bench_db_profiles,
+    "answer-statements": bench_answer_statements,
+    "session-store": bench_session_store,
+    "analytics": bench_analytics,
+    "answer-matching": bench_answer_matching,
+    "catalogue": bench_catalogue,
+    "search": bench_search,
+    "serialization": bench_serialization,
+    "startup": bench_startup,
+    "metrics": bench_metrics,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run StudyBuddy micro-benchmarks.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark]()
@@ -0,0 +1,137 @@
+# utils/csv_ingest.py
+
+import codecs
+import csv
+import hashlib
+import os
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from models import Quiz, Question
+from utils.answer_matching import accepted_answers
+
+# Upload limits, enforced while streaming so oversized files are rejected early
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+MAX_UPLOAD_ROWS = int(os.getenv("MAX_UPLOAD_ROWS", 100_000))
+
+CHUNK_SIZE = 64 * 1024  # Bytes read from the upload at a time
+BATCH_SIZE = 1000  # Questions per bulk insert
+MAX_REPORTED_ERRORS = 100  # Row errors returned to the client
+
+
+def iter_lines(fileobj, chunk_size: int = CHUNK_SIZE, max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Decode a binary file chunk by chunk and yield it line by line.
+    Only the current chunk and one partial line are held in memory.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    total_bytes = 0
+    try:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            total_bytes += len(chunk)
+            if total_bytes > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the limit of {max_bytes} bytes.",
+                )
+            lines = (pending + decoder.decode(chunk)).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="File must be UTF-8 encoded."
+        )
+    if pending:
+        yield pending
+
+
+def ingest_questions_csv(db: Session, quiz: Quiz, fileobj, max_rows: int = MAX_UPLOAD_ROWS) -> dict:
+    """
+    Stream Q/A rows from a CSV file into the questions table of a flushed quiz.
+
+    Rows are validated one at a time and inserted in batches of BATCH_SIZE.
+    Invalid and duplicate rows are skipped and reported by row number.
+    Sets total_questions and questions_version on the quiz; the caller commits.
+    """
+    reader = csv.reader(iter_lines(fileobj))
+    header = next(reader, None)
+    if not header or "Q" not in header or "A" not in header:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV must contain 'Q' and 'A' columns.",
+        )
+    q_index, a_index = header.index("Q"), header.index("A")
+
+    seen = set()  # Digests of prompts already inserted
+    errors = []
+    skipped_rows = 0
+    data_rows = 0
+    ordinal = 0
+    batch = []
+    version = hashlib.sha1()
+
+    def skip(row_number: int, message: str):
+        nonlocal skipped_rows
+        skipped_rows += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "error": message})
+
+    try:
+        for row in reader:
+            row_number = reader.line_num
+            if not any(cell.strip() for cell in row):
+                continue  # Blank lines are ignored, as before
+
+            data_rows += 1
+            if data_rows > max_rows:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the limit of {max_rows} rows.",
+                )
+
+            if len(row) <= max(q_index, a_index):
+                skip(row_number, "Row is missing the Q or A column.")
+                continue
+            prompt, answer = row[q_index].strip(), row[a_index].strip()
+            if not prompt:
+                skip(row_number, "Question is empty.")
+                continue
+            if not answer:
+                skip(row_number, "Answer is empty.")
+                continue
+
+            digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=16).digest()
+            if digest in seen:
+                skip(row_number, f"Duplicate question '{prompt}'.")
+                continue
+            seen.add(digest)
+
+            batch.append({
+                "quiz_id": quiz.id,
+                "ordinal": ordinal,
+                "prompt": prompt,
+                "answer": answer,
+                "accepted_answers": accepted_answers(answer),
+            })
+            Quiz.hash_question(version, prompt, answer)
+            ordinal += 1
+            if len(batch) >= BATCH_SIZE:
+                db.execute(Question.__table__.insert(), batch)
+                batch = []
+    except csv.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Malformed CSV near line {reader.line_num}: {e}",
+        )
+
+    if batch:
+        db.execute(Question.__table__.insert(), batch)
+
+    quiz.total_questions = ordinal
+    quiz.questions_version = version.hexdigest()
+    return {"total_questions": ordinal, "skipped_rows": skipped_rows, "errors": errors}
@@ -0,0 +1,399 @@
+# utils/generate_data.py
+#
+# Synthetic data for scale testing: users, quizzes with their questions, and
+# millions of quiz sessions, written with batched Core inserts.
+#
+#   DATABASE_URL=sqlite:///./scale.db python -m utils.generate_data --users 20000 --reports 2000000
+#
+# The data is shaped like production:
+# - Popularity is Zipf-skewed: a few quizzes get most sessions and a few
+#   learners take most of them (--skew).
+# - Sessions run in chronological order over --days. Most complete;
+#   the rest stop partway through.
+# - Scores follow each learner's ability and each question's difficulty.
+#   Wrong answers are typos, other answers of the quiz, or blanks.
+# - A share of sessions is stored the legacy way, with asked_questions and
+#   no deck.
+# Question counters and quiz statistics are accumulated while generating.
+# user_stats, score_buckets, the search index and the admin user come from
+# the regular startup backfills. Mastery rows, one per learner and question
+# answered, are opt-in (--mastery) because they are held in memory until the end.
+#
+# The same arguments and seed produce the same rows; only the salt of the
+# shared password hash differs between runs. Every learner's password is
+# GENERATED_PASSWORD. The target database must not contain any users yet.
+
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, text
+from database import Base, DATABASE_URL, build_engine
+from models import User, Quiz, Question, Report, QuestionDeck, QuestionMastery
+from utils.answer_matching import accepted_answers
+from utils.startup import initialize_once
+from utils.utils import password_context
+
+GENERATED_PASSWORD = "password"
+# Sessions end at this instant, so the output does not depend on the clock
+GENERATE_END = datetime(2026, 1, 1)
+SYLLABLES = [
+    "ka", "lo", "mi", "ne", "ra", "to", "su", "vi", "den", "mar", "tol", "bri", "sen", "qua", "zor",
+    "pel", "gar", "fen", "lum", "tis", "ber", "cal", "dro", "hex", "jun", "nov", "ost", "pra", "rux", "vel",
+]
+
+
+def zipf_cum_weights(rng: random.Random, count: int, skew: float) -> list:
+    """Cumulative Zipf weights over `count` items in random rank order, for rng.choices."""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** skew for rank in ranks))
+
+
+def make_vocabulary(rng: random.Random, size: int) -> list:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))))
+    return sorted(words)
+
+
+def typo(rng: random.Random, answer: str) -> str:
+    """The answer with one character dropped, doubled or swapped with its neighbour."""
+    if len(answer) < 2:
+        return answer + answer
+    i = int(rng.random() * (len(answer) - 1))
+    kind = rng.random()
+    if kind < 1 / 3:
+        return answer[:i] + answer[i + 1:]
+    if kind < 2 / 3:
+        return answer[:i] + answer[i] + answer[i:]
+    return answer[:i] + answer[i + 1] + answer[i] + answer[i + 2:]
+
+
+def insert_batches(engine, table, rows, batch_size: int):
+    """Insert rows with executemany, one transaction per batch."""
+    for start in range(0, len(rows), batch_size):
+        with engine.begin() as conn:
+            conn.execute(table.insert(), rows[start:start + batch_size])
+
+
+class GeneratedQuiz:
+    """What session generation needs to know about a quiz."""
+
+    __slots__ = ("id", "first_question_id", "prompts", "answers", "ease", "sessions", "completed", "score_sum", "best")
+
+    def __init__(self, quiz_id: int, first_question_id: int, prompts: list, answers: list, ease: list):
+        self.id = quiz_id
+        self.first_question_id = first_question_id  # Question ids are contiguous in ordinal order
+        self.prompts = prompts
+        self.answers = answers
+        self.ease = ease  # Per question, multiplies the learner's ability
+        self.sessions = 0
+        self.completed = 0
+        self.score_sum = 0.0
+        self.best = None
+
+
+def generate_users(engine, rng: random.Random, count: int, batch_size: int) -> list:
+    """Insert `count` learners sharing one password hash and return their abilities."""
+    password = password_context().hash(GENERATED_PASSWORD)
+    first_session = GENERATE_END - timedelta(days=365 * 2)
+    rows, abilities = [], []
+    for user_id in range(1, count + 1):
+        rows.append({
+            "id": user_id,
+            "username": f"learner{user_id:07d}",
+            "password": password,
+            "created_on": first_session - timedelta(seconds=rng.uniform(0, 90 * 86400)),
+            "is_admin": 0,
+        })
+        abilities.append(rng.betavariate(5, 2))
+    insert_batches(engine, User.__table__, rows, batch_size)
+    print(f"Inserted {count} users")
+    return abilities
+
+
+def generate_quizzes(engine, rng: random.Random, count: int, users: int, min_size: int, max_size: int,
+                     user_weights: list, batch_size: int) -> list:
+    """Insert quizzes and their questions; creators are drawn like active learners."""
+    vocabulary = make_vocabulary(rng, 4000)
+    created_by_user = {}
+    names = set()
+    quiz_rows, question_rows, quizzes = [], [], []
+    question_id = 1
+    for quiz_id in range(1, count + 1):
+        creator = rng.choices(range(1, users + 1), cum_weights=user_weights)[0]
+        # Creators stay within the default upload limit; a full one hands the
+        # quiz to the next user with room, which generate_data guarantees exists
+        while created_by_user.get(creator, 0) >= User.max_quizzes.default.arg:
+            creator = creator % users + 1
+        created_by_user[creator] = created_by_user.get(creator, 0) + 1
+
+        name = " ".join(rng.choice(vocabulary).capitalize() for _ in range(rng.randint(2, 4)))
+        while name in names:
+            name += f" {rng.randint(2, 99)}"
+        names.add(name)
+
+        size = rng.randint(min_size, max_size)
+        questions = {}
+        while len(questions) < size:
+            prompt = f"What is the {rng.choice(vocabulary)} of {' '.join(rng.sample(vocabulary, 2))}?"
+            questions[prompt] = " ".join(rng.sample(vocabulary, rng.choice((1, 1, 1, 2))))
+        for ordinal, (prompt, answer) in enumerate(questions.items()):
+            question_rows.append({
+                "id": question_id + ordinal,
+                "quiz_id": quiz_id,
+                "ordinal": ordinal,
+                "prompt": prompt,
+                "answer": answer,
+                "accepted_answers": accepted_answers(answer),
+                "attempt_count": 0,
+                "miss_count": 0,
+            })
+        quiz_rows.append({
+            "id": quiz_id,
+            "name": name,
+            "questions_version": Quiz.compute_version(questions),
+            "created_on": GENERATE_END - timedelta(days=365 * 2, seconds=rng.uniform(0, 60 * 86400)),
+            "created_by": creator,
+            "total_questions": size,
+            "fuzzy_tolerance": rng.choice((0, 0, 0, 0, 1, 2)),
+        })
+        quizzes.append(GeneratedQuiz(
+            quiz_id, question_id, list(questions), list(questions.values()),
+            [rng.uniform(0.6, 1.1) for _ in range(size)],
+        ))
+        question_id += size
+    insert_batches(engine, Quiz.__table__, quiz_rows, batch_size)
+    insert_batches(engine, Question.__table__, question_rows, batch_size)
+    print(f"Inserted {count} quizzes with {len(question_rows)} questions")
+    return quizzes
+
+
+def wrong_answer(rng: random.Random, quiz: GeneratedQuiz, ordinal: int) -> str:
+    roll = rng.random()
+    if roll < 0.4:
+        return typo(rng, quiz.answers[ordinal])
+    if roll < 0.85:
+        return quiz.answers[int(rng.random() * len(quiz.answers))]  # Mixed up with another question
+    return ""
+
+
+def generate_reports(engine, rng: random.Random, count: int, quizzes: list, abilities: list, user_weights: list,
+                     quiz_weights: list, days: int, completion_rate: float, legacy_share: float,
+                     mastery: dict, batch_size: int) -> dict:
+    """Insert `count` sessions in chronological order and return answers per question id."""
+    question_counts = {}  # question id -> [attempts, misses]
+    started_at = time.perf_counter()
+    span = days * 86400
+    first = GENERATE_END - timedelta(seconds=span)
+    user_ids = range(1, len(abilities) + 1)
+    report_id = 1
+
+    while report_id <= count:
+        size = min(batch_size, count - report_id + 1)
+        report_rows, deck_rows = [], []
+        batch_users = rng.choices(user_ids, cum_weights=user_weights, k=size)
+        batch_quizzes = rng.choices(quizzes, cum_weights=quiz_weights, k=size)
+        for user_id, quiz in zip(batch_users, batch_quizzes):
+            # Stratified times keep the sessions in id order without sorting
+            started_on = first + timedelta(seconds=(report_id - 1 + rng.random()) * span / count)
+            total = len(quiz.prompts)
+            # Sorting by random keys shuffles several times faster than rng.shuffle
+            keys = [rng.random() for _ in range(total)]
+            order = sorted(range(total), key=keys.__getitem__)
+            completed = rng.random() < completion_rate
+            answered = total if completed else rng.randrange(total)
+            ability = abilities[user_id - 1]
+            seconds_per_answer = rng.uniform(6, 40)
+
+            correct_total = 0
+            incorrect_answers = []
+            for position in range(answered):
+                ordinal = order[position]
+                question_id = quiz.first_question_id + ordinal
+                correct = rng.random() < ability * quiz.ease[ordinal]
+                counts = question_counts.setdefault(question_id, [0, 0])
+                counts[0] += 1
+                if correct:
+                    correct_total += 1
+                else:
+                    counts[1] += 1
+                    incorrect_answers.append({
+                        "question": quiz.prompts[ordinal],
+                        "user_answer": wrong_answer(rng, quiz, ordinal),
+                        "correct_answer": quiz.answers[ordinal],
+                    })
+                if mastery is not None:
+                    seen_on = started_on + timedelta(seconds=position * seconds_per_answer)
+                    entry = mastery.setdefault((user_id, question_id), [quiz.id, 0, 0, 0, seen_on])
+                    entry[1 if correct else 2] += 1
+                    entry[3] = entry[3] + 1 if correct else 0
+                    entry[4] = seen_on
+
+            # Sessions in progress have dealt the question they are waiting on
+            dealt = answered if completed else answered + 1
+            legacy = rng.random() < legacy_share
+            score = correct_total / total * 100 if completed else None
+            report_rows.append({
+                "id": report_id,
+                "user_id": user_id,
+                "quiz_id": quiz.id,
+                "started_on": started_on,
+                "completed_on": started_on + timedelta(seconds=answered * seconds_per_answer) if completed else None,
+                "score": score,
+                "total_correct": correct_total,
+                "total_incorrect": answered - correct_total,
+                "incorrect_answers": incorrect_answers,
+                "asked_questions": [quiz.prompts[o] for o in order[:dealt]] if legacy else [],
+                "cursor": None if legacy else dealt,
+                "version": 2 + answered,  # The insert, dealing the first question, then one per answer
+                "client_attempt_id": None,
+                "mode": "standard",
+            })
+            if not legacy:
+                deck_rows.append({"report_id": report_id, "question_order": QuestionDeck.pack(order)})
+
+            quiz.sessions += 1
+            if completed:
+                quiz.completed += 1
+                quiz.score_sum += score
+                quiz.best = score if quiz.best is None else max(quiz.best, score)
+            report_id += 1
+
+        with engine.begin() as conn:
+            conn.execute(Report.__table__.insert(), report_rows)
+            if deck_rows:
+                conn.execute(QuestionDeck.__table__.insert(), deck_rows)
+        done = report_id - 1
+        print(f"Inserted {done}/{count} reports ({done / (time.perf_counter() - started_at):.0f}/s)")
+    return question_counts
+
+
+def write_statistics(engine, quizzes: list, question_counts: dict, mastery: dict, batch_size: int):
+    """Store the counters gathered while generating sessions."""
+    questions = Question.__table__
+    quizzes_table = Quiz.__table__
+    with engine.begin() as conn:
+        conn.execute(
+            questions.update().where(questions.c.id == bindparam("question_id")).values(
+                attempt_count=bindparam("attempts"), miss_count=bindparam("misses"),
+            ),
+            [{"question_id": q, "attempts": a, "misses": m} for q, (a, m) in question_counts.items()],
+        )
+        conn.execute(
+            quizzes_table.update().where(quizzes_table.c.id == bindparam("quiz_id")).values(
+                times_accessed=bindparam("accessed"), times_completed=bindparam("completed"),
+                average_score=bindparam("average"), highest_score=bindparam("best"),
+            ),
+            [
+                {
+                    "quiz_id": quiz.id,
+                    "accessed": quiz.sessions,
+                    "completed": quiz.completed,
+                    "average": quiz.score_sum / quiz.completed if quiz.completed else 0.0,
+                    "best": quiz.best or 0.0,
+                }
+                for quiz in quizzes
+            ],
+        )
+    if mastery:
+        rows = [
+            {
+                "user_id": user_id,
+                "question_id": question_id,
+                "quiz_id": quiz_id,
+                "correct_count": correct,
+                "incorrect_count": incorrect,
+                "streak": streak,
+                "last_seen": last_seen,
+                "next_due": QuestionMastery.due_after(last_seen, streak) if streak else last_seen,
+            }
+            for (user_id, question_id), (quiz_id, correct, incorrect, streak, last_seen) in mastery.items()
+        ]
+        insert_batches(engine, QuestionMastery.__table__, rows, batch_size)
+        print(f"Inserted {len(rows)} question mastery rows")
+
+
+def generate_data(
+    url: str = DATABASE_URL,
+    users: int = 10_000,
+    quizzes: int = 500,
+    reports: int = 1_000_000,
+    min_questions: int = 10,
+    max_questions: int = 50,
+    skew: float = 1.1,
+    days: int = 365,
+    completion_rate: float = 0.85,
+    legacy_share: float = 0.05,
+    mastery: bool = False,
+    seed: int = 1,
+    batch_size: int = 10_000,
+):
+    """Fill an empty database with generated users, quizzes and reports."""
+    quiz_limit = User.max_quizzes.default.arg
+    if quizzes > users * quiz_limit:
+        raise SystemExit(
+            f"{quizzes} quizzes do not fit {users} users at {quiz_limit} quizzes each; "
+            f"pass at least --users {-(-quizzes // quiz_limit)}."
+        )
+    started = time.perf_counter()
+    engine = build_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        if conn.execute(text("SELECT 1 FROM users LIMIT 1")).first():
+            raise SystemExit(f"{url} already has users; generate into an empty database.")
+
+    rng = random.Random(seed)
+    abilities = generate_users(engine, rng, users, batch_size)
+    user_weights = zipf_cum_weights(rng, users, skew)
+    generated = generate_quizzes(engine, rng, quizzes, users, min_questions, max_questions, user_weights, batch_size)
+    quiz_weights = zipf_cum_weights(rng, quizzes, skew)
+    mastery_rows = {} if mastery else None
+    question_counts = generate_reports(
+        engine, rng, reports, generated, abilities, user_weights, quiz_weights,
+        days, completion_rate, legacy_share, mastery_rows, batch_size,
+    )
+    write_statistics(engine, generated, question_counts, mastery_rows, batch_size)
+
+    # user_stats, score_buckets, the search index and the admin user
+    initialize_once(engine)
+    top = sorted(generated, key=lambda q: q.sessions, reverse=True)
+    top_share = sum(q.sessions for q in top[: max(1, quizzes // 100)]) / max(1, reports)
+    print(f"Generated the database in {time.perf_counter() - started:.0f}s; "
+          f"the top 1% of quizzes hold {top_share:.0%} of the reports")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill an empty database with synthetic StudyBuddy data.")
+    parser.add_argument("--database", default=DATABASE_URL, help="Target database URL (default: DATABASE_URL)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--quizzes", type=int, default=500)
+    parser.add_argument("--reports", type=int, default=1_000_000)
+    parser.add_argument("--min-questions", type=int, default=10)
+    parser.add_argument("--max-questions", type=int, default=50)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of quiz and learner popularity")
+    parser.add_argument("--days", type=int, default=365, help="Period the sessions are spread over")
+    parser.add_argument("--completion-rate", type=float, default=0.85)
+    parser.add_argument("--legacy-share", type=float, default=0.05, help="Sessions stored without a deck")
+    parser.add_argument("--mastery", action="store_true", help="Also write question_mastery rows")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+    generate_data(
+        url=args.database,
+        users=args.users,
+        quizzes=args.quizzes,
+        reports=args.reports,
+        min_questions=args.min_questions,
+        max_questions=args.max_questions,
+        skew=args.skew,
+        days=args.days,
+        completion_rate=args.completion_rate,
+        legacy_share=args.legacy_share,
+        mastery=args.mastery,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
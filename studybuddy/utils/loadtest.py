@@ -0,0 +1,301 @@
+# utils/loadtest.py
+#
+# Load generator for the quiz session flow. Each simulated learner:
+# 1. registers and fetches a token;
+# 2. lists the catalogue;
+# 3. starts a quiz and answers until it completes;
+# 4. browses reports: its own report, its history and the quiz's reports.
+# Every response is timed per endpoint. The run reports throughput and
+# p50/p95/p99 latency and can save them as JSON to compare commits:
+#
+#   DATABASE_URL=sqlite:///./loadtest.db python -m utils.loadtest --learners 50 --output before.json
+#   ...change submit_answer...
+#   DATABASE_URL=sqlite:///./loadtest.db python -m utils.loadtest --learners 50 --compare before.json
+#
+# Without --url the app runs in this process, lifespan included, against
+# DATABASE_URL. With --url the requests go to a running instance, e.g.
+# http://127.0.0.1:8000, or http://localhost/api behind nginx.
+#
+# Unless --quiz-id is given, the run uploads its own quiz, so it knows the
+# answers. Learners answer correctly with probability --accuracy. Against an
+# existing quiz they learn the answers from the corrections they receive.
+# The seed fixes every learner's answers and think times. Usernames get a
+# fresh run id, so runs can repeat against the same database.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+import httpx
+
+LOADTEST_PASSWORD = "loadtest-password"
+MAX_RETRIES = 5  # Per request, for 503 responses that carry Retry-After
+
+SUBMIT_ANSWER = "POST /quizzes/{quiz_id}/submit-answer"
+
+
+class LearnerFailed(Exception):
+    """A step returned an unexpected status; the learner stops there."""
+
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Recorder:
+    """Latencies and status codes per endpoint."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+
+    async def request(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send and time one request; raise LearnerFailed unless it succeeds."""
+        for attempt in range(MAX_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                self.samples[endpoint].append(time.perf_counter() - started)
+                self.statuses[endpoint][type(e).__name__] += 1
+                self.errors[endpoint] += 1
+                raise LearnerFailed(f"{endpoint}: {e!r}")
+            self.samples[endpoint].append(time.perf_counter() - started)
+            self.statuses[endpoint][str(response.status_code)] += 1
+
+            retry_after = response.headers.get("retry-after")
+            if response.status_code == 503 and retry_after and attempt < MAX_RETRIES:
+                # The password pool sheds load this way; clients are expected to come back
+                self.retries[endpoint] += 1
+                await asyncio.sleep(float(retry_after))
+                continue
+            if response.status_code >= 400:
+                self.errors[endpoint] += 1
+                raise LearnerFailed(f"{endpoint} returned {response.status_code}: {response.text[:200]}")
+            return response
+
+    def summary(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            endpoints[endpoint] = {
+                "requests": len(ordered),
+                "errors": self.errors[endpoint],
+                "retries": self.retries[endpoint],
+                "statuses": dict(self.statuses[endpoint]),
+                "throughput_rps": len(ordered) / wall_seconds,
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return endpoints
+
+
+class LoadQuiz:
+    """The quiz under test and the answers learned so far, shared by all learners."""
+
+    def __init__(self, quiz_id: int, answers: dict = None):
+        self.id = quiz_id
+        self.answers = answers or {}
+
+
+async def register_and_login(client: httpx.AsyncClient, recorder: Recorder, username: str) -> dict:
+    """Register a user and return its Authorization header."""
+    await recorder.request(
+        client, "POST /users/register", "POST", "/users/register",
+        json={"username": username, "password": LOADTEST_PASSWORD},
+    )
+    response = await recorder.request(
+        client, "POST /users/token", "POST", "/users/token",
+        data={"username": username, "password": LOADTEST_PASSWORD},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def prepare_quiz(client: httpx.AsyncClient, run_id: str, args) -> LoadQuiz:
+    """Use --quiz-id, or upload a generated quiz whose answers the learners know."""
+    if args.quiz_id:
+        return LoadQuiz(args.quiz_id)
+
+    headers = await register_and_login(client, Recorder(), f"loadtest-{run_id}-owner")
+    answers = {f"Load test question {i}": f"answer {i}" for i in range(args.questions)}
+    csv_body = "Q,A\n" + "".join(f"{question},{answer}\n" for question, answer in answers.items())
+    response = await client.post(
+        "/quizzes/upload-csv",
+        data={"name": f"Load test {run_id}"},
+        files={"file": ("loadtest.csv", csv_body.encode("utf-8"), "text/csv")},
+        headers=headers,
+    )
+    response.raise_for_status()
+    return LoadQuiz(response.json()["id"], answers)
+
+
+async def run_learner(client: httpx.AsyncClient, recorder: Recorder, quiz: LoadQuiz, run_id: str, index: int, args):
+    """One learner's whole visit: sign up, take --sessions quizzes, browse reports."""
+    rng = random.Random(f"{args.seed}:{index}")
+    await asyncio.sleep(args.ramp_up * index / args.learners)
+
+    async def think():
+        if args.think_time:
+            await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+    headers = await register_and_login(client, recorder, f"loadtest-{run_id}-{index}")
+    await recorder.request(client, "GET /quizzes/", "GET", "/quizzes/")
+
+    for _ in range(args.sessions):
+        session = (await recorder.request(
+            client, "POST /quizzes/start", "POST", "/quizzes/start", params={"quiz_id": quiz.id}, headers=headers,
+        )).json()
+        report_id, question = session["report_id"], session["next_question"]
+        while True:
+            await think()
+            known = quiz.answers.get(question)
+            answer = known if known is not None and rng.random() < args.accuracy else f"wrong {rng.randrange(1000)}"
+            step = (await recorder.request(
+                client, SUBMIT_ANSWER, "POST", f"/quizzes/{quiz.id}/submit-answer",
+                params={"report_id": report_id, "question": question, "user_answer": answer},
+            )).json()
+            if step.get("correct_answer") is not None:
+                quiz.answers[question] = step["correct_answer"]
+            if step["status"] == "completed":
+                break
+            question = step["next_question"]
+
+        await think()
+        await recorder.request(client, "GET /reports/{report_id}", "GET", f"/reports/{report_id}")
+        await recorder.request(
+            client, "GET /reports/by-user", "GET", "/reports/by-user", params={"limit": 20}, headers=headers,
+        )
+        await recorder.request(
+            client, "GET /reports/by-quiz/{quiz_id}", "GET", f"/reports/by-quiz/{quiz.id}", params={"limit": 20},
+        )
+
+
+@asynccontextmanager
+async def open_client(args):
+    """An HTTP client for --url, or one wired straight into the app with its lifespan running."""
+    limits = httpx.Limits(max_connections=args.learners + 1, max_keepalive_connections=args.learners + 1)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+            yield client
+        return
+
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            yield client
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    run_id = uuid.uuid4().hex[:8]
+    recorder = Recorder()
+    async with open_client(args) as client:
+        quiz = await prepare_quiz(client, run_id, args)
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(run_learner(client, recorder, quiz, run_id, i, args) for i in range(args.learners)),
+            return_exceptions=True,
+        )
+        wall_seconds = time.perf_counter() - started
+
+    failures = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+    for failure in failures[:5]:
+        print(f"Learner failed: {failure}")
+    unexpected = [f for f in failures if not isinstance(f, LearnerFailed)]
+    if unexpected:
+        raise unexpected[0]
+
+    endpoints = recorder.summary(wall_seconds)
+    total_requests = sum(e["requests"] for e in endpoints.values())
+    return {
+        "revision": git_revision(),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or f"in-process ({os.getenv('DATABASE_URL', 'sqlite:///./test.db')})",
+        "settings": {
+            key: getattr(args, key)
+            for key in ("learners", "sessions", "questions", "accuracy", "think_time", "ramp_up", "seed", "quiz_id")
+        },
+        "session_store": os.getenv("SESSION_STORE", "db"),
+        "quiz_id": quiz.id,
+        "wall_seconds": wall_seconds,
+        "failed_learners": len(failures),
+        "completed_sessions": (args.learners - len(failures)) * args.sessions,
+        "throughput_rps": total_requests / wall_seconds,
+        "endpoints": endpoints,
+    }
+
+
+def print_results(results: dict, baseline: dict = None):
+    print(f"{results['target']} @ {results['revision']}: {results['settings']['learners']} learners, "
+          f"{results['wall_seconds']:.1f}s, {results['throughput_rps']:.0f} req/s, "
+          f"{results['failed_learners']} failed learners")
+    if baseline and baseline.get("settings") != results["settings"]:
+        print(f"Baseline {baseline.get('revision')} ran with different settings: {baseline.get('settings')}")
+    print(f"{'endpoint':>38} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for endpoint, stats in results["endpoints"].items():
+        line = (f"{endpoint:>38} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>8.1f} "
+                f"{stats['p50_ms']:>7.1f}ms {stats['p95_ms']:>7.1f}ms {stats['p99_ms']:>7.1f}ms")
+        before = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if before:
+            changes = [
+                f"{(stats[key] - before[key]) / before[key] * 100:+.0f}%" if before[key] else "n/a"
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+            ]
+            line += f"   vs baseline {' / '.join(changes)}"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent learners against StudyBuddy.")
+    parser.add_argument("--url", help="Base URL of a running instance; omit to run the app in this process")
+    parser.add_argument("--learners", type=int, default=20, help="Concurrent learners")
+    parser.add_argument("--sessions", type=int, default=1, help="Quizzes each learner completes")
+    parser.add_argument("--questions", type=int, default=20, help="Size of the generated quiz")
+    parser.add_argument("--quiz-id", type=int, help="Use an existing quiz instead of uploading one")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="Chance of answering a known question correctly")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between answers, in seconds")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which learners start")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout, in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare against")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.output}")
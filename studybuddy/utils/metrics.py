@@ -0,0 +1,310 @@
+# utils/metrics.py
+#
+# Request and database metrics, exported at /metrics in the Prometheus text
+# format.
+#
+# MetricsMiddleware is a plain ASGI middleware, so a request costs two clock
+# reads and a few dict updates on the event loop, with no locks. For every
+# request it records:
+# - latency, by method and route template;
+# - the status code;
+# - the SQL statements run and the time spent in them.
+# Statements are attributed through a context variable that the engine
+# listeners from instrument_engine() read. The variable follows the request
+# into threadpool handlers and SQLAlchemy's async greenlets. A request is
+# measured until its last body message is sent; the response's BackgroundTasks
+# run after that, so they and statements run outside any request, such as the
+# session checkpointer's, are counted as background work.
+#
+# Every uvicorn worker keeps its own numbers. Each sample carries a `worker`
+# label (the pid), so a scrape that reaches any worker through the load
+# balancer adds to that worker's series instead of mixing them. Aggregate with
+# sum without (worker).
+
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from utils.question_cache import question_cache
+from utils.response_cache import response_cache
+from utils.session_store import session_store
+from utils.token_cache import token_cache
+from utils.utils import password_pool
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# Label for requests no route matched, so unknown paths cannot create new series
+UNMATCHED_ROUTE = "unmatched"
+
+# Component stats() keys that only ever grow; the rest are exported as gauges
+COUNTER_STATS = {
+    "hits", "misses", "evictions", "not_modified", "invalidations",
+    "loads", "checkpoints", "completed", "rejected", "job_seconds",
+}
+COMPONENTS = {
+    "question_cache": question_cache,
+    "response_cache": response_cache,
+    "token_cache": token_cache,
+    "session_store": session_store,
+    "password_pool": password_pool,
+}
+
+# [statements, seconds, open] of the request being served, if any; open turns
+# False once the response is sent
+current_request_db: ContextVar = ContextVar("current_request_db", default=None)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values))
+
+
+class Histogram:
+    """Bucketed observations per label set. Not thread-safe; observe from the event loop."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple, buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            # Per-bucket counts (the last one is +Inf), sum, count
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, worker: str) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in list(self._series.items()):
+            base = f"{worker},{format_labels(self.labelnames, labels)}"
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+class RequestMetrics:
+    """Per-process request, database and component metrics."""
+
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.latency = Histogram(
+            "studybuddy_http_request_duration_seconds", "Time to serve a request, by route template.",
+            ("method", "route"), LATENCY_BUCKETS,
+        )
+        self.statements = Histogram(
+            "studybuddy_http_request_db_statements", "SQL statements run while serving a request.",
+            ("method", "route"), STATEMENT_BUCKETS,
+        )
+        self.responses = {}  # (method, route, status) -> count
+        self.db_seconds = {}  # (method, route) -> seconds spent in SQL
+        self.engines = {}  # name -> Engine
+        self.connections_opened = {}  # engine name -> count
+        self._lock = threading.Lock()
+        self.background_statements = 0
+        self.background_seconds = 0.0
+
+    def record(self, method: str, route: str, status: int, seconds: float, db: list):
+        labels = (method, route)
+        self.latency.observe(labels, seconds)
+        self.statements.observe(labels, db[0])
+        self.db_seconds[labels] = self.db_seconds.get(labels, 0.0) + db[1]
+        key = (method, route, status)
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+    def record_background(self, seconds: float):
+        with self._lock:
+            self.background_statements += 1
+            self.background_seconds += seconds
+
+    def reset(self):
+        """Forget every observation, keeping the instrumented engines."""
+        self.latency._series.clear()
+        self.statements._series.clear()
+        self.responses.clear()
+        self.db_seconds.clear()
+        with self._lock:
+            self.background_statements = 0
+            self.background_seconds = 0.0
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        worker = f'worker="{os.getpid()}"'
+        lines = [
+            "# HELP studybuddy_process_start_time_seconds Start time of this worker since the epoch.",
+            "# TYPE studybuddy_process_start_time_seconds gauge",
+            f"studybuddy_process_start_time_seconds{{{worker}}} {self.started_at}",
+            "# HELP studybuddy_http_requests_in_flight Requests being served.",
+            "# TYPE studybuddy_http_requests_in_flight gauge",
+            f"studybuddy_http_requests_in_flight{{{worker}}} {self.in_flight}",
+            "# HELP studybuddy_http_responses_total Responses sent, by route template and status code.",
+            "# TYPE studybuddy_http_responses_total counter",
+        ]
+        for labels, count in list(self.responses.items()):
+            lines.append(
+                f"studybuddy_http_responses_total{{{worker},{format_labels(('method', 'route', 'status'), labels)}}} {count}"
+            )
+        lines += self.latency.render(worker)
+        lines += self.statements.render(worker)
+        lines += [
+            "# HELP studybuddy_http_request_db_seconds_total Time spent in SQL statements while serving requests.",
+            "# TYPE studybuddy_http_request_db_seconds_total counter",
+        ]
+        for labels, seconds in list(self.db_seconds.items()):
+            lines.append(
+                f"studybuddy_http_request_db_seconds_total{{{worker},{format_labels(('method', 'route'), labels)}}} {seconds}"
+            )
+        with self._lock:
+            background = (self.background_statements, self.background_seconds)
+        lines += [
+            "# HELP studybuddy_db_background_statements_total SQL statements run outside any request.",
+            "# TYPE studybuddy_db_background_statements_total counter",
+            f"studybuddy_db_background_statements_total{{{worker}}} {background[0]}",
+            "# HELP studybuddy_db_background_seconds_total Time spent in SQL statements outside any request.",
+            "# TYPE studybuddy_db_background_seconds_total counter",
+            f"studybuddy_db_background_seconds_total{{{worker}}} {background[1]}",
+        ]
+        lines += self.render_pools(worker)
+        lines += self.render_components(worker)
+        return "\n".join(lines) + "\n"
+
+    def render_pools(self, worker: str) -> list:
+        gauges = {
+            "size": "Connections the pool keeps.",
+            "checked_out": "Connections in use.",
+            "checked_in": "Idle connections in the pool.",
+            "overflow": "Connections open beyond the pool size.",
+        }
+        samples = {name: [] for name in gauges}
+        for engine_name, engine in self.engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue  # Pools without a fixed size (NullPool, StaticPool) report nothing
+            labels = f'{worker},engine="{engine_name}"'
+            samples["size"].append(f"{{{labels}}} {pool.size()}")
+            samples["checked_out"].append(f"{{{labels}}} {pool.checkedout()}")
+            samples["checked_in"].append(f"{{{labels}}} {pool.checkedin()}")
+            samples["overflow"].append(f"{{{labels}}} {max(0, pool.overflow())}")  # Negative below the pool size
+        lines = []
+        for name, help in gauges.items():
+            metric = f"studybuddy_db_pool_{name}"
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} gauge"]
+            lines += [f"{metric}{sample}" for sample in samples[name]]
+        lines += [
+            "# HELP studybuddy_db_connections_opened_total New DBAPI connections opened by the engine.",
+            "# TYPE studybuddy_db_connections_opened_total counter",
+        ]
+        for engine_name, count in list(self.connections_opened.items()):
+            lines.append(f'studybuddy_db_connections_opened_total{{{worker},engine="{engine_name}"}} {count}')
+        return lines
+
+    def render_components(self, worker: str) -> list:
+        lines = []
+        for component, source in COMPONENTS.items():
+            for key, value in source.stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if key in COUNTER_STATS:
+                    metric, kind = f"studybuddy_{component}_{key}_total", "counter"
+                else:
+                    metric, kind = f"studybuddy_{component}_{key}", "gauge"
+                lines += [
+                    f"# HELP {metric} {key.replace('_', ' ').capitalize()} reported by the {component.replace('_', ' ')}.",
+                    f"# TYPE {metric} {kind}",
+                    f"{metric}{{{worker}}} {value}",
+                ]
+        return lines
+
+
+metrics = RequestMetrics()
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Count and time the statements of an engine and export its pool under `name`."""
+    metrics.engines[name] = engine
+    metrics.connections_opened.setdefault(name, 0)
+
+    @event.listens_for(engine, "connect")
+    def count_connection(dbapi_connection, connection_record):
+        metrics.connections_opened[name] += 1
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        if metrics.enabled:
+            conn.info["metrics_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finish_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("metrics_started", None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        db = current_request_db.get()
+        if db is None or not db[2]:
+            metrics.record_background(seconds)
+        else:
+            db[0] += 1
+            db[1] += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and DB work of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]  # What the client sees if the app raises before responding
+        db = [0, 0.0, True]
+
+        def finish():
+            if not db[2]:
+                return
+            db[2] = False  # Later statements, like BackgroundTasks', are background work
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            metrics.record(
+                scope["method"], route.path if route is not None else UNMATCHED_ROUTE, status[0], elapsed, db
+            )
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        token = current_request_db.set(db)
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request_db.reset(token)
+            finish()  # No-op unless the app raised or never finished its response
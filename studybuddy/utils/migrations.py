@@ -0,0 +1,193 @@
+# utils/migrations.py
+
+import json
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from database import engine as default_engine
+from utils.search import create_search_index
+
+
+def add_missing_column(engine: Engine, table: str, column: str, ddl: str) -> bool:
+    """
+    Add a column to an existing table if it is not there yet.
+    Returns True when the column was added.
+    """
+    if column_exists(engine, table, column):
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    print(f"Added column {table}.{column}")
+    return True
+
+
+def column_exists(engine: Engine, table: str, column: str) -> bool:
+    """Check whether a table currently has a column."""
+    return column in {col["name"] for col in inspect(engine).get_columns(table)}
+
+
+def migrate_questions_blob(engine: Engine):
+    """
+    Move questions from the legacy quizzes.questions JSON column into the
+    questions table, then drop the column. Safe to run more than once.
+    """
+    from models.quiz import Quiz
+    from models.question import Question
+
+    if not column_exists(engine, "quizzes", "questions"):
+        return
+
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, questions FROM quizzes")).fetchall()
+        for quiz_id, questions_json in rows:
+            already_migrated = conn.execute(
+                text("SELECT 1 FROM questions WHERE quiz_id = :id LIMIT 1"), {"id": quiz_id}
+            ).first()
+            if already_migrated:
+                continue
+
+            questions = {
+                str(prompt): str(answer)
+                for prompt, answer in json.loads(questions_json or "{}").items()
+            }
+            if questions:
+                conn.execute(
+                    Question.__table__.insert(),
+                    [
+                        {"quiz_id": quiz_id, "ordinal": ordinal, "prompt": prompt, "answer": answer}
+                        for ordinal, (prompt, answer) in enumerate(questions.items())
+                    ],
+                )
+            conn.execute(
+                text(
+                    "UPDATE quizzes SET questions_version = :version, total_questions = :total "
+                    "WHERE id = :id"
+                ),
+                {
+                    "version": Quiz.compute_version(questions),
+                    "total": len(questions),
+                    "id": quiz_id,
+                },
+            )
+        conn.execute(text("ALTER TABLE quizzes DROP COLUMN questions"))
+    print(f"Migrated questions of {len(rows)} quizzes into the questions table")
+
+
+def populate_accepted_answers(engine: Engine, batch_size: int = 1000):
+    """
+    Precompute normalized accepted answers for questions stored before the
+    column existed, and recompute the ones stored under an older normalization.
+    """
+    from sqlalchemy import bindparam
+    from models.question import Question
+    from utils.answer_matching import accepted_answers
+
+    table = Question.__table__
+    statement = (
+        table.update()
+        .where(table.c.id == bindparam("question_id"))
+        .values(accepted_answers=bindparam("accepted"))
+    )
+    total = 0
+    last_id = 0
+    with engine.begin() as conn:
+        while True:
+            rows = conn.execute(
+                table.select().with_only_columns(table.c.id, table.c.answer, table.c.accepted_answers)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            changed = [
+                {"question_id": question_id, "accepted": accepted}
+                for question_id, answer, stored in rows
+                if (accepted := accepted_answers(answer)) != stored
+            ]
+            if changed:
+                conn.execute(statement, changed)
+                total += len(changed)
+    if total:
+        print(f"Precomputed accepted answers for {total} questions")
+
+
+def create_missing_indexes(engine: Engine):
+    """
+    Create indexes declared on models whose tables already existed.
+    create_all only creates indexes together with new tables.
+    """
+    from database import Base
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def drop_index(engine: Engine, table: str, index: str):
+    """Drop an index superseded by a new one, if it is still there."""
+    if index not in {ix["name"] for ix in inspect(engine).get_indexes(table)}:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP INDEX {index}"))
+    print(f"Dropped index {index}")
+
+
+def populate_user_stats(engine: Engine):
+    """
+    Fill user_stats for databases that had users before the table existed.
+    """
+    from sqlalchemy.orm import Session
+    from models.user_stats import UserStats
+
+    with Session(bind=engine) as db:
+        has_stats = db.execute(text("SELECT 1 FROM user_stats LIMIT 1")).first()
+        has_users = db.execute(text("SELECT 1 FROM users LIMIT 1")).first()
+        if has_users and not has_stats:
+            total = UserStats.rebuild(db)
+            db.commit()
+            print(f"Populated user_stats for {total} users")
+
+
+def populate_score_buckets(engine: Engine):
+    """
+    Fill the leaderboard histograms for databases that had completed reports before the table existed.
+    """
+    from sqlalchemy.orm import Session
+    from models.score_bucket import ScoreBucket
+
+    with Session(bind=engine) as db:
+        has_buckets = db.execute(text("SELECT 1 FROM score_buckets LIMIT 1")).first()
+        has_scores = db.execute(text("SELECT 1 FROM reports WHERE score IS NOT NULL LIMIT 1")).first()
+        if has_scores and not has_buckets:
+            total = ScoreBucket.rebuild(db)
+            db.commit()
+            print(f"Populated {total} score buckets")
+
+
+def run_migrations(engine: Engine = default_engine):
+    """
+    Bring an existing database up to the current schema.
+    Tables are created by Base.metadata.create_all; this handles columns and backfills.
+    """
+    add_missing_column(engine, "quizzes", "questions_version", "VARCHAR")
+    migrate_questions_blob(engine)
+    # No default: a NULL cursor marks sessions started before decks existed
+    add_missing_column(engine, "reports", "cursor", "INTEGER")
+    add_missing_column(engine, "reports", "version", "INTEGER NOT NULL DEFAULT 1")
+    add_missing_column(engine, "reports", "client_attempt_id", "VARCHAR(64)")
+    add_missing_column(engine, "reports", "mode", "VARCHAR(16) NOT NULL DEFAULT 'standard'")
+    add_missing_column(engine, "questions", "attempt_count", "INTEGER NOT NULL DEFAULT 0")
+    add_missing_column(engine, "questions", "miss_count", "INTEGER NOT NULL DEFAULT 0")
+    add_missing_column(engine, "questions", "accepted_answers", "JSON")
+    add_missing_column(engine, "quizzes", "fuzzy_tolerance", "INTEGER NOT NULL DEFAULT 0")
+    populate_accepted_answers(engine)
+    create_missing_indexes(engine)
+    drop_index(engine, "reports", "ix_reports_quiz_score")  # Now ix_reports_quiz_leaderboard
+    populate_user_stats(engine)
+    populate_score_buckets(engine)
+    create_search_index(engine)
+
+
+if __name__ == "__main__":
+    run_migrations()
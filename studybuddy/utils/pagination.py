@@ -0,0 +1,41 @@
+# utils/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from utils.serialization import dumps
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*key) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor."""
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in key]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, *types) -> tuple:
+    """Decode a cursor produced by encode_cursor, converting each value to the given type."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(values) != len(types):
+            raise ValueError("wrong cursor length")
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def stream_json_array(items):
+    """Yield a JSON array chunk by chunk, one encoded item at a time."""
+    yield b"["
+    for index, item in enumerate(items):
+        if index:
+            yield b","
+        yield dumps(item)
+    yield b"]"
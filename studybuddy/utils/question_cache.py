@@ -0,0 +1,109 @@
+# utils/question_cache.py
+
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+# Memory budget for decoded question maps, per worker process
+QUESTION_CACHE_MAX_BYTES = int(os.getenv("QUESTION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+# A decoded quiz: the question -> answer map, its keys in ordinal order and the
+# question -> normalized accepted answers map used for grading
+DecodedQuestions = namedtuple("DecodedQuestions", ["questions", "keys", "accepted"])
+
+
+def estimate_size(questions: dict, accepted: dict = None) -> int:
+    """
+    Approximate the memory footprint of a decoded question map in bytes.
+    """
+    size = sys.getsizeof(questions) + sys.getsizeof(list(questions))
+    for question, answer in questions.items():
+        size += sys.getsizeof(question) + sys.getsizeof(answer)
+    if accepted:
+        size += sys.getsizeof(accepted)
+        for alternatives in accepted.values():
+            size += sys.getsizeof(alternatives) + sum(sys.getsizeof(a) for a in alternatives)
+    return size
+
+
+class QuestionCache:
+    """
+    Bounded LRU cache of decoded question maps.
+
+    Entries are keyed by (quiz_id, version), where version is the content hash
+    stored on the Quiz row. A re-upload or edit changes the hash, so every
+    worker misses on its next lookup and stale entries simply age out.
+    """
+
+    def __init__(self, max_bytes: int = QUESTION_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, quiz_id: int, version: str):
+        """Return the cached DecodedQuestions, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get((quiz_id, version))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((quiz_id, version))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, quiz_id: int, version: str, questions: dict, accepted: dict) -> DecodedQuestions:
+        """Store a decoded question map, evicting least recently used entries."""
+        decoded = DecodedQuestions(questions, list(questions), accepted)
+        size = estimate_size(questions, accepted)
+        if size > self.max_bytes:
+            return decoded
+        key = (quiz_id, version)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            # Older versions of the same quiz can never be hit again
+            for stale in [k for k in self._entries if k[0] == quiz_id]:
+                self.current_bytes -= self._entries.pop(stale)[1]
+                self.evictions += 1
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (decoded, size)
+            self.current_bytes += size
+        return decoded
+
+    def invalidate(self, quiz_id: int):
+        """Drop every cached version of a quiz."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == quiz_id]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and memory usage."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+question_cache = QuestionCache()
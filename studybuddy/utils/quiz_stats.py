@@ -0,0 +1,91 @@
+# utils/quiz_stats.py
+
+import atexit
+import os
+import threading
+
+# "immediate" applies each update as one atomic UPDATE inside the request's transaction.
+# "deferred" accumulates deltas in memory and flushes them from a background thread;
+# up to one flush interval of statistics is lost if the worker dies.
+QUIZ_STATS_MODE = os.getenv("QUIZ_STATS_MODE", "immediate")
+QUIZ_STATS_FLUSH_SECONDS = float(os.getenv("QUIZ_STATS_FLUSH_SECONDS", 2.0))
+
+
+class QuizStatsAccumulator:
+    """
+    Per-process buffer of quiz statistic deltas, flushed in batches.
+    Each quiz's pending deltas become a single atomic UPDATE on flush.
+    """
+
+    def __init__(self, flush_seconds: float = QUIZ_STATS_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._pending = {}  # quiz_id -> {"accessed", "completed", "score_sum", "best_score"}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.flushes = 0
+
+    def record(self, quiz_id: int, accessed: int = 0, completed: int = 0, score: float = None):
+        """Add deltas for a quiz; they are written on the next flush."""
+        self._merge(quiz_id, {
+            "accessed": accessed,
+            "completed": completed,
+            "score_sum": score or 0.0,
+            "best_score": score,
+        })
+
+    def _merge(self, quiz_id: int, delta: dict):
+        with self._lock:
+            pending = self._pending.setdefault(
+                quiz_id, {"accessed": 0, "completed": 0, "score_sum": 0.0, "best_score": None}
+            )
+            pending["accessed"] += delta["accessed"]
+            pending["completed"] += delta["completed"]
+            pending["score_sum"] += delta["score_sum"]
+            if delta["best_score"] is not None and (
+                pending["best_score"] is None or delta["best_score"] > pending["best_score"]
+            ):
+                pending["best_score"] = delta["best_score"]
+            self._ensure_flusher()
+
+    def flush(self, session_factory=None):
+        """Write all pending deltas in one transaction."""
+        from database import SessionLocal
+        from models.quiz import Quiz
+
+        session_factory = session_factory or SessionLocal
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        with session_factory() as db:
+            try:
+                for quiz_id, delta in pending.items():
+                    Quiz.apply_stats_delta(db, quiz_id, **delta)
+                db.commit()
+                self.flushes += 1
+            except Exception as e:
+                db.rollback()
+                print(f"Error flushing quiz statistics: {e}")
+                # Put the deltas back so the next flush retries them
+                for quiz_id, delta in pending.items():
+                    self._merge(quiz_id, delta)
+
+    def stop(self):
+        """Stop the background thread and flush what is left."""
+        self._stop.set()
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="quiz-stats-flusher", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+
+quiz_stats = QuizStatsAccumulator()
@@ -0,0 +1,23 @@
+from database import SessionLocal
+from models import UserStats
+
+
+def rebuild_user_stats():
+    """
+    Recompute the user_stats table from scratch.
+    Run after bulk imports or manual data fixes: python -m utils.rebuild_user_stats
+    """
+    with SessionLocal() as db:
+        try:
+            total = UserStats.rebuild(db)
+            db.commit()
+            print(f"Rebuilt statistics for {total} users.")
+        except Exception as e:
+            db.rollback()
+            print(f"Error rebuilding user statistics: {e}")
+            raise
+
+
+# Run the function when the script is executed
+if __name__ == "__main__":
+    rebuild_user_stats()
@@ -0,0 +1,149 @@
+# utils/response_cache.py
+#
+# Serialized responses of the quiz catalogue endpoints, with strong ETags.
+# A request whose If-None-Match matches the cached ETag gets a 304 without
+# touching the database.
+#
+# Entries are dropped when the data behind them changes: writers call
+# invalidate_on_commit(db, key), which drops the entry immediately and again
+# once the transaction commits, so a request that read the old rows in between
+# cannot put them back. Other workers keep their copy until the TTL runs out.
+
+import hashlib
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from fastapi import Request, Response, status
+from utils.serialization import dumps
+
+# Upper bound on how long another worker's change can go unnoticed
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 30))
+# max-age sent to clients; 0 makes them revalidate with If-None-Match every time
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", 0))
+
+CATALOGUE_KEY = "catalogue"
+
+
+def quiz_key(quiz_id: int) -> str:
+    return f"quiz:{quiz_id}"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag, as RFC 9110 prescribes for it."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class CachedResponse:
+    """A serialized JSON body and its ETag."""
+
+    __slots__ = ("body", "etag", "expires_at")
+
+    def __init__(self, body: bytes, expires_at: float):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        self.expires_at = expires_at
+
+    def to_response(self, request: Request, cache: "ResponseCache") -> Response:
+        """The full response, or 304 when the client already has this version."""
+        headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={cache.max_age}, must-revalidate",
+        }
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            cache.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    Per-process map of cache key -> CachedResponse.
+
+    Every key has a generation that invalidation bumps. A response built from
+    rows read before an invalidation carries the older generation and is not
+    stored, so stale data never replaces a fresh invalidation.
+    """
+
+    def __init__(self, ttl: float = RESPONSE_CACHE_TTL_SECONDS, max_age: int = RESPONSE_CACHE_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+
+    def get(self, key: str):
+        """Return the live CachedResponse for a key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def generation(self, key: str) -> int:
+        """Read before loading the rows of a response; pass it to put."""
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def put(self, key: str, payload, generation: int) -> CachedResponse:
+        """Serialize a payload, caching it unless the key was invalidated since `generation`."""
+        body = dumps(payload)
+        entry = CachedResponse(body, time.monotonic() + self.ttl)
+        with self._lock:
+            if self._generations.get(key, 0) == generation:
+                self._entries[key] = entry
+        return entry
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+                self.invalidations += 1
+
+    def invalidate_on_commit(self, db: Session, *keys: str):
+        """Drop entries now and again after `db` commits."""
+        self.invalidate(*keys)
+        db.info.setdefault("response_cache_keys", set()).update(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.not_modified = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed(session):
+    keys = session.info.pop("response_cache_keys", None)
+    if keys:
+        response_cache.invalidate(*keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_rolled_back(session):
+    session.info.pop("response_cache_keys", None)
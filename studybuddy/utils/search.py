@@ -0,0 +1,155 @@
+# utils/search.py
+#
+# Full-text search over quiz names and question/answer text.
+#
+# On SQLite the index is an FTS5 table, quiz_search, with one row per quiz
+# (rowid = quiz id) and the name, prompts and answers in separate columns.
+# Snippets come from the prompts only, since search is open to everyone and
+# must not reveal the answers. run_migrations creates and fills it, and
+# upload-csv adds each new quiz in the same transaction; quizzes are not edited
+# or deleted after upload, so nothing else has to maintain it. Other databases fall back
+# to matching quiz names with LIKE, in id order.
+#
+# Ranking costs a bm25 evaluation per matching quiz (about 110ms for 100k
+# matches), so a broad query (a word in most quizzes) is ranked only among its
+# SEARCH_MAX_RANKED newest matches. Such words say little about relevance
+# anyway, and latency stays bounded however large the catalogue grows. The
+# response then carries SEARCH_TRUNCATED_HEADER, so clients can ask the user to
+# narrow the query.
+
+import os
+import re
+from sqlalchemy import DateTime, Float, Integer, String, func, literal, select, text
+from sqlalchemy.engine import Engine
+
+SEARCH_TABLE = "quiz_search"
+# bm25 weight of a match in the quiz name, relative to one in the questions
+NAME_WEIGHT = 10.0
+# Longer queries are cut to this many terms
+MAX_QUERY_TERMS = 16
+# Queries matching more quizzes than this rank only the newest ones
+SEARCH_MAX_RANKED = int(os.getenv("SEARCH_MAX_RANKED", 5000))
+# Set to "true" on every page of a query ranked among its newest matches only
+SEARCH_TRUNCATED_HEADER = "X-Search-Truncated"
+SNIPPET_TOKENS = 12
+SEARCH_COLUMNS = ["name", "prompts", "answers"]
+PROMPTS_COLUMN = SEARCH_COLUMNS.index("prompts")
+
+INDEX_QUIZZES_SQL = f"""
+    INSERT INTO {SEARCH_TABLE}(rowid, name, prompts, answers)
+    SELECT quizzes.id, quizzes.name,
+        (SELECT group_concat(questions.prompt, ' ') FROM questions WHERE questions.quiz_id = quizzes.id),
+        (SELECT group_concat(questions.answer, ' ') FROM questions WHERE questions.quiz_id = quizzes.id)
+    FROM quizzes
+"""
+
+
+def uses_fts(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def create_search_index(engine: Engine):
+    """
+    Create the FTS5 table and index every existing quiz. Does nothing when it
+    already exists with the current columns or the database is not SQLite; an
+    index with older columns is rebuilt.
+    """
+    if not uses_fts(engine):
+        return
+    with engine.begin() as conn:
+        columns = [row.name for row in conn.execute(text(f"PRAGMA table_info({SEARCH_TABLE})"))]
+        if columns == SEARCH_COLUMNS:
+            return
+        if columns:
+            conn.execute(text(f"DROP TABLE {SEARCH_TABLE}"))
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+            f"{', '.join(SEARCH_COLUMNS)}, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        ))
+        # Default ORDER BY rank: bm25 with name matches weighted up
+        conn.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25({NAME_WEIGHT}, 1.0, 1.0)')"
+        ))
+        total = conn.execute(text(INDEX_QUIZZES_SQL)).rowcount
+    print(f"Created the search index for {total} quizzes")
+
+
+def index_quiz(db, quiz_id: int):
+    """Add a quiz, with its questions already flushed, to the search index. The caller commits."""
+    if uses_fts(db.get_bind()):
+        db.execute(text(INDEX_QUIZZES_SQL + " WHERE quizzes.id = :quiz_id"), {"quiz_id": quiz_id})
+
+
+def query_terms(q: str) -> list:
+    """Split a user query into words; FTS5 syntax in it is ignored."""
+    return re.findall(r"\w+", q)[:MAX_QUERY_TERMS]
+
+
+def match_expression(terms: list) -> str:
+    """An FTS5 query requiring every term; the last one is a prefix, so results follow the user's typing."""
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+
+async def search_quizzes(db, q: str, limit: int, after_key: tuple = None) -> tuple:
+    """
+    Return one page of quizzes matching every word of `q`, best match first,
+    the (rank, id, lowest ranked id) key of the next page or None, and whether
+    older matches were left out of the ranking.
+    Each result is a row with id, name, created_on, total_questions, rank and snippet.
+    """
+    terms = query_terms(q)
+    if not terms:
+        return [], None, False
+    if uses_fts(db.get_bind()):
+        rows, lowest_id = await _search_fts(db, terms, limit, after_key)
+    else:
+        rows, lowest_id = await _search_names(db, terms, limit, after_key), 0
+    truncated = lowest_id > 0
+    if len(rows) <= limit:
+        return rows, None, truncated
+    return rows[:limit], (rows[limit].rank, rows[limit].id, lowest_id), truncated
+
+
+async def _search_fts(db, terms: list, limit: int, after_key: tuple) -> tuple:
+    match = match_expression(terms)
+    if after_key:
+        lowest_id = after_key[2]
+    else:
+        # Later pages keep the first page's window, so paging stays consistent
+        beyond = await db.execute(text(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+            "ORDER BY rowid DESC LIMIT 1 OFFSET :ranked"
+        ), {"match": match, "ranked": SEARCH_MAX_RANKED})
+        beyond_id = beyond.scalar()
+        lowest_id = beyond_id + 1 if beyond_id is not None else 0
+
+    params = {"match": match, "lowest_id": lowest_id, "limit": limit + 1}
+    after = ""
+    if after_key:
+        after = f"AND ({SEARCH_TABLE}.rank > :rank OR ({SEARCH_TABLE}.rank = :rank AND {SEARCH_TABLE}.rowid >= :id))"
+        params["rank"], params["id"] = after_key[:2]
+    result = await db.execute(text(f"""
+        SELECT {SEARCH_TABLE}.rowid AS id, quizzes.name, quizzes.created_on, quizzes.total_questions,
+               {SEARCH_TABLE}.rank AS rank,
+               snippet({SEARCH_TABLE}, {PROMPTS_COLUMN}, '[', ']', '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {SEARCH_TABLE} JOIN quizzes ON quizzes.id = {SEARCH_TABLE}.rowid
+        WHERE {SEARCH_TABLE} MATCH :match AND {SEARCH_TABLE}.rowid >= :lowest_id {after}
+        ORDER BY {SEARCH_TABLE}.rank, {SEARCH_TABLE}.rowid
+        LIMIT :limit
+    """).columns(
+        id=Integer, name=String, created_on=DateTime, total_questions=Integer, rank=Float, snippet=String
+    ), params)
+    return result.all(), lowest_id
+
+
+async def _search_names(db, terms: list, limit: int, after_key: tuple) -> list:
+    from models import Quiz
+
+    query = select(
+        Quiz.id, Quiz.name, Quiz.created_on, Quiz.total_questions,
+        literal(0.0).label("rank"), literal(None).label("snippet"),
+    ).where(*[func.lower(Quiz.name).contains(term.lower(), autoescape=True) for term in terms])
+    if after_key:
+        query = query.where(Quiz.id >= after_key[1])
+    result = await db.execute(query.order_by(Quiz.id).limit(limit + 1))
+    return result.all()
@@ -0,0 +1,32 @@
+# utils/serialization.py
+#
+# JSON encoding for responses, backed by orjson.
+#
+# FastAPI validates a returned value against the route's response_model and
+# runs jsonable_encoder over it before encoding. Payloads built from our own
+# rows already have the declared shape, so routes serving them return
+# TrustedJSONResponse instead: no validation, no jsonable_encoder, one orjson
+# call. Keep response_model on those routes; it still documents the OpenAPI schema.
+
+from datetime import datetime
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def json_default(value):
+    """Fallback for values the encoders do not handle natively."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    """Encode a value as compact UTF-8 JSON. Naive datetimes come out like isoformat()."""
+    return orjson.dumps(value, default=json_default)
+
+
+class TrustedJSONResponse(ORJSONResponse):
+    """A JSON response whose content is encoded as is, without response_model validation."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
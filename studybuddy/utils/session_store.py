@@ -0,0 +1,348 @@
+# utils/session_store.py
+#
+# In-memory store for quiz sessions in progress.
+#
+# With SESSION_STORE=memory, submit-answer grades and deals from a per-process
+# copy of the session (cursor, totals, misses and the shuffled deck) and only
+# writes the reports row at checkpoints: every SESSION_CHECKPOINT_ANSWERS
+# answers, when a session has unsaved answers older than
+# SESSION_CHECKPOINT_SECONDS (checked on the next answer and by a background
+# thread), and in full when the session completes.
+#
+# Crash recovery: a checkpoint writes cursor, totals and incorrect answers in one
+# UPDATE, so the row is always a consistent snapshot of some earlier answer.
+# question_mastery updates are buffered too and written in the same transaction.
+# If the worker dies, answers given since the last checkpoint are lost. The
+# session resumes from the snapshot: the question dealt at that point is asked
+# again, and submit-answer returns 409 with that question if the client answers
+# a different one. Completed sessions are never lost; completion is
+# committed before the response is sent.
+#
+# The store is per process. Run a single worker, or route each session to the
+# same worker. Checkpoints compare the row's version column, so a second
+# worker that holds the same session gets a 409 instead of silently overwriting it.
+
+import atexit
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import update
+from utils.answer_matching import answer_matches, display_answer
+
+# "off" writes every answer to the database; "memory" buffers sessions in this process
+SESSION_STORE = os.getenv("SESSION_STORE", "off")
+SESSION_CHECKPOINT_ANSWERS = int(os.getenv("SESSION_CHECKPOINT_ANSWERS", 10))
+SESSION_CHECKPOINT_SECONDS = float(os.getenv("SESSION_CHECKPOINT_SECONDS", 30.0))
+# Sessions with nothing to save are dropped from memory after this long without answers
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", 900.0))
+
+
+class SessionConflict(Exception):
+    """The reports row changed underneath a buffered session."""
+
+
+class SessionState:
+    """
+    A quiz session in progress, as held by the store.
+    """
+
+    def __init__(self, report, decoded, question_order: bytes, tolerance: int, bind):
+        self.bind = bind  # Engine the session was loaded from; background checkpoints use it
+        self.report_id = report.id
+        self.quiz_id = report.quiz_id
+        self.user_id = report.user_id
+        self.decoded = decoded  # DecodedQuestions of the quiz
+        self.tolerance = tolerance  # The quiz's fuzzy tolerance when the session was loaded
+        self.question_order = question_order  # Packed deck, see QuestionDeck
+        self.cursor = report.cursor
+        self.total_correct = report.total_correct or 0
+        self.total_incorrect = report.total_incorrect or 0
+        self.incorrect_answers = list(report.incorrect_answers or [])
+        self.version = report.version
+        self.pending_mastery = []  # (question index, correct, answered on) since the last checkpoint
+        self.unsaved_answers = 0
+        self.unsaved_since = None
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.question_order) // 4
+
+    def index_at(self, position: int) -> int:
+        """Return the question index at a deck position."""
+        return struct.unpack_from("<I", self.question_order, position * 4)[0]
+
+    def question_at(self, position: int) -> str:
+        """Return the prompt at a deck position."""
+        return self.decoded.keys[self.index_at(position)]
+
+    def current_question(self) -> str:
+        """Return the dealt question the session is waiting on."""
+        return self.question_at(self.cursor - 1)
+
+    def log_answer(self, question: str, user_answer: str) -> tuple:
+        """
+        Grade an answer to the current question and update the totals.
+        Returns (result, correct_answer).
+        """
+        correct_answer = display_answer(self.decoded.questions[question])
+        correct = answer_matches(user_answer, self.decoded.accepted[question], self.tolerance)
+        self.pending_mastery.append((self.index_at(self.cursor - 1), correct, datetime.utcnow()))
+        self.unsaved_answers += 1
+        self.unsaved_since = self.unsaved_since or time.monotonic()
+        self.last_seen = time.monotonic()
+        if correct:
+            self.total_correct += 1
+            return "correct", correct_answer
+        self.total_incorrect += 1
+        self.incorrect_answers.append({
+            "question": question,
+            "user_answer": user_answer,
+            "correct_answer": correct_answer,
+        })
+        return "incorrect", correct_answer
+
+    def is_exhausted(self) -> bool:
+        return self.cursor >= self.total_questions
+
+    def deal_next_question(self) -> str:
+        """Advance the cursor and return the newly dealt question."""
+        self.cursor += 1
+        return self.current_question()
+
+    def checkpoint_due(self, answers: int, seconds: float) -> bool:
+        if not self.unsaved_answers:
+            return False
+        return self.unsaved_answers >= answers or time.monotonic() - self.unsaved_since >= seconds
+
+    def write_mastery(self, db):
+        """Record the buffered answers in the question counters and question_mastery. The caller commits."""
+        from models import Question, QuestionMastery
+
+        if not self.pending_mastery:
+            return
+        question_ids = Question.get_ids_by_ordinal(
+            db, self.quiz_id, list({index for index, _, _ in self.pending_mastery})
+        )
+        Question.record_results(db, [
+            (question_ids[index], correct) for index, correct, _ in self.pending_mastery
+        ])
+        QuestionMastery.record_answers(db, self.user_id, self.quiz_id, [
+            (question_ids[index], correct, answered_on)
+            for index, correct, answered_on in self.pending_mastery
+        ])
+        self.pending_mastery = []
+
+    def apply_to(self, report):
+        """Copy the buffered progress onto a Report loaded in the current transaction."""
+        report.cursor = self.cursor
+        report.total_correct = self.total_correct
+        report.total_incorrect = self.total_incorrect
+        report.incorrect_answers = list(self.incorrect_answers)
+
+
+class ActiveSessionStore:
+    """
+    Per-process buffer of in-progress quiz sessions, checkpointed to the reports table.
+    """
+
+    def __init__(
+        self,
+        mode: str = SESSION_STORE,
+        checkpoint_answers: int = SESSION_CHECKPOINT_ANSWERS,
+        checkpoint_seconds: float = SESSION_CHECKPOINT_SECONDS,
+        idle_seconds: float = SESSION_IDLE_SECONDS,
+    ):
+        self.mode = mode
+        self.checkpoint_answers = checkpoint_answers
+        self.checkpoint_seconds = checkpoint_seconds
+        self.idle_seconds = idle_seconds
+        self._sessions = {}  # report_id -> SessionState
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.loads = 0
+        self.checkpoints = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "memory"
+
+    def get(self, db, report_id: int):
+        """
+        Return the buffered session for a report, loading it from the database on a miss.
+        Returns None for reports the store does not handle: missing, completed, or
+        legacy sessions without a deck.
+        """
+        from models import Report, Quiz
+
+        with self._lock:
+            state = self._sessions.get(report_id)
+        if state is not None:
+            return state
+
+        row = (
+            db.query(Report, Quiz)
+            .join(Quiz, Quiz.id == Report.quiz_id)
+            .filter(Report.id == report_id)
+            .first()
+        )
+        if row is None:
+            return None
+        report, quiz = row
+        if report.completed_on or report.cursor is None or report.deck is None:
+            return None
+        loaded = SessionState(
+            report, quiz._decoded_questions(), report.deck.question_order, quiz.fuzzy_tolerance, db.get_bind()
+        )
+
+        with self._lock:
+            # Another request may have loaded it meanwhile; keep the first copy
+            state = self._sessions.setdefault(report_id, loaded)
+            if state is loaded:
+                self.loads += 1
+            self._ensure_flusher()
+        return state
+
+    @contextmanager
+    def checkout(self, db, report_id: int):
+        """
+        Lock a report's buffered session for the duration of one answer.
+        Yields None when the store does not handle the report.
+        """
+        while True:
+            state = self.get(db, report_id)
+            if state is None:
+                yield None
+                return
+            with state.lock:
+                # Evicted or dropped while we waited: load a fresh copy
+                if self._holds(state):
+                    state.last_seen = time.monotonic()
+                    yield state
+                    return
+
+    def checkpoint(self, db, state: SessionState):
+        """
+        Write a session's progress to its reports row in one UPDATE, plus the buffered
+        question_mastery updates. The caller commits.
+        Raises SessionConflict, and drops the session, if the row changed since it was loaded.
+        """
+        from models import Report
+
+        result = db.execute(
+            update(Report)
+            .where(Report.id == state.report_id, Report.version == state.version)
+            .values(
+                cursor=state.cursor,
+                total_correct=state.total_correct,
+                total_incorrect=state.total_incorrect,
+                incorrect_answers=list(state.incorrect_answers),
+                version=state.version + 1,
+            ),
+            execution_options={"synchronize_session": False},
+        )
+        if result.rowcount == 0:
+            self.discard(state.report_id)
+            raise SessionConflict(state.report_id)
+        state.write_mastery(db)
+        state.version += 1
+        state.unsaved_answers = 0
+        state.unsaved_since = None
+        self.checkpoints += 1
+
+    def discard(self, report_id: int):
+        """Forget a session, e.g. once it has been persisted as completed."""
+        with self._lock:
+            self._sessions.pop(report_id, None)
+
+    def flush(self, force: bool = False):
+        """
+        Checkpoint sessions whose unsaved answers are older than the checkpoint
+        interval (every unsaved session when `force` is set) and drop idle ones.
+        """
+        from sqlalchemy.orm import Session
+
+        with self._lock:
+            states = list(self._sessions.values())
+        now = time.monotonic()
+        due = [
+            s for s in states
+            if s.checkpoint_due(self.checkpoint_answers, 0 if force else self.checkpoint_seconds)
+        ]
+
+        for state in due:
+            # A request working on the session will checkpoint it itself if needed
+            if not state.lock.acquire(blocking=force):
+                continue
+            try:
+                if not self._holds(state):
+                    continue
+                with Session(bind=state.bind) as db:
+                    try:
+                        self.checkpoint(db, state)
+                        db.commit()
+                    except SessionConflict:
+                        db.rollback()
+                        print(f"Dropped buffered session for report {state.report_id}: row changed")
+                    except Exception as e:
+                        db.rollback()
+                        # The row keeps the previous checkpoint; reload from it next time
+                        self.discard(state.report_id)
+                        print(f"Error checkpointing report {state.report_id}: {e}")
+            finally:
+                state.lock.release()
+
+        for state in states:
+            if state.unsaved_answers or now - state.last_seen < self.idle_seconds:
+                continue
+            if state.lock.acquire(blocking=False):
+                try:
+                    if not state.unsaved_answers:
+                        self.discard(state.report_id)
+                finally:
+                    state.lock.release()
+
+    def _holds(self, state: SessionState) -> bool:
+        with self._lock:
+            return self._sessions.get(state.report_id) is state
+
+    def crash(self):
+        """Drop every buffered session without saving it, as a dying worker would."""
+        with self._lock:
+            self._sessions.clear()
+
+    def stop(self):
+        """Stop the background thread and checkpoint everything still unsaved."""
+        self._stop.set()
+        if self.enabled:
+            self.flush(force=True)
+
+    def stats(self) -> dict:
+        """Return the number of buffered sessions and checkpoint counters."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "mode": self.mode,
+            "sessions": len(sessions),
+            "unsaved_answers": sum(s.unsaved_answers for s in sessions),
+            "loads": self.loads,
+            "checkpoints": self.checkpoints,
+        }
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="session-checkpointer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.wait(max(self.checkpoint_seconds / 2, 0.5)):
+            self.flush()
+
+
+session_store = ActiveSessionStore()
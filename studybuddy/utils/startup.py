@@ -0,0 +1,98 @@
+# utils/startup.py
+#
+# One-time database initialization for all workers: create tables, run
+# migrations and make sure the admin user exists.
+#
+# main.py calls initialize_once() from the app's lifespan hook, in every
+# worker. When schema_info already holds the current schema fingerprint it
+# returns after one query. Otherwise the worker takes a cross-process lock, a
+# Postgres advisory lock or a file lock next to the other workers, checks
+# again and does the work, so concurrent workers never race on DDL.
+
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from database import Base, DATABASE_URL, engine as default_engine
+
+# Bump when a migration changes data without changing any table
+INIT_REVISION = 3  # 3: search snippets leave out the answers
+# Arbitrary key of the Postgres advisory lock
+INIT_ADVISORY_LOCK_KEY = 0x53545544
+INIT_LOCK_PATH = os.getenv(
+    "INIT_LOCK_PATH",
+    os.path.join(
+        tempfile.gettempdir(),
+        f"studybuddy-init-{hashlib.sha1(DATABASE_URL.encode('utf-8')).hexdigest()[:12]}.lock",
+    ),
+)
+
+
+def schema_fingerprint() -> str:
+    """
+    Hash of the declared tables, columns and indexes, the init revision and the
+    admin username. It changes whenever startup has new work to do.
+    """
+    import models  # noqa: F401  Registers every table on Base.metadata
+
+    hasher = hashlib.sha1(f"{INIT_REVISION}:{os.getenv('ADMIN_USERNAME', 'admin')}".encode("utf-8"))
+    for table in Base.metadata.sorted_tables:
+        hasher.update(table.name.encode("utf-8"))
+        for column in table.columns:
+            hasher.update(f"|{column.name}:{column.type!r}".encode("utf-8"))
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            hasher.update(f"|{index.name}".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+@contextmanager
+def init_lock(engine: Engine):
+    """Hold a lock shared by every process initializing this database."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": INIT_ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": INIT_ADVISORY_LOCK_KEY})
+        return
+
+    import fcntl
+
+    with open(INIT_LOCK_PATH, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def initialize_once(engine: Engine = default_engine) -> bool:
+    """
+    Create tables, run migrations and create the admin user unless this schema
+    was already initialized. Returns True when this process did the work.
+    """
+    from sqlalchemy.orm import Session, sessionmaker
+    from models import User, SchemaInfo
+    from utils.migrations import run_migrations
+
+    fingerprint = schema_fingerprint()
+    if SchemaInfo.get_fingerprint(engine) == fingerprint:
+        return False
+
+    with init_lock(engine):
+        # Another worker may have finished while we waited for the lock
+        if SchemaInfo.get_fingerprint(engine) == fingerprint:
+            return False
+        started = time.perf_counter()
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        User.create_admin(sessionmaker(bind=engine))
+        with Session(bind=engine) as db:
+            SchemaInfo.set_fingerprint(db, fingerprint)
+            db.commit()
+        print(f"Initialized the database in {time.perf_counter() - started:.2f}s")
+    return True
@@ -0,0 +1,91 @@
+# utils/token_cache.py
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+# Verified tokens are trusted for at most this long before being re-checked
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 30))
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", 10_000))
+
+
+class Principal(NamedTuple):
+    """The authenticated caller, detached from any database session."""
+    id: int
+    username: str
+    is_admin: bool
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified token -> Principal.
+
+    An entry lives until the short TTL or the token's own `exp`, whichever is
+    first. Changes to a user in this process drop their entries immediately;
+    other workers pick the change up once the TTL runs out.
+    """
+
+    def __init__(self, ttl: float = TOKEN_CACHE_TTL_SECONDS, max_entries: int = TOKEN_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token -> (principal, expires_at)
+        self._tokens_by_username = {}  # username -> set of tokens
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str):
+        """Return the cached Principal, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    self._remove(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, principal: Principal, token_exp: float = None):
+        """Cache a verified token, never beyond its `exp` claim."""
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+            self._entries[token] = (principal, expires_at)
+            self._tokens_by_username.setdefault(principal.username, set()).add(token)
+
+    def invalidate_user(self, username: str):
+        """Drop every cached token of a user."""
+        with self._lock:
+            for token in list(self._tokens_by_username.get(username, ())):
+                self._remove(token)
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_username.clear()
+
+    def _remove(self, token: str):
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_username.get(principal.username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_username[principal.username]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and size."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_cache = TokenCache()
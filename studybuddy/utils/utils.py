@@ -1,11 +1,19 @@
 # utils.py
 
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from functools import lru_cache
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt runs on a dedicated process pool so it never holds the event loop or the GIL
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", 2))
+PASSWORD_POOL_MAX_PENDING = int(os.getenv("PASSWORD_POOL_MAX_PENDING", 32))  # Queued + running jobs
+PASSWORD_POOL_RETRY_AFTER = 1  # Seconds suggested to clients when the pool is saturated
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
@@ -27,14 +35,120 @@ def verify_token(token: str):
     except JWTError:
         raise ValueError("Invalid token")
     
+@lru_cache(maxsize=None)
+def password_context():
+    """
+    Password hashing configuration. Only pool workers hash, so passlib is
+    imported there on first use instead of in every web worker.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash_password(password: str) -> str:
+    """Runs in a pool worker."""
+    return password_context().hash(password)
+
+
+def _verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Runs in a pool worker."""
+    return password_context().verify(plain_password, hashed_password)
+
+
+class PasswordPool:
+    """
+    Size-limited process pool for bcrypt with back-pressure.
+
+    At most `max_pending` jobs may be queued or running; further submissions
+    are rejected straight away with a 503 instead of piling up behind a burst.
+    """
+
+    def __init__(self, workers: int = PASSWORD_POOL_WORKERS, max_pending: int = PASSWORD_POOL_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.job_seconds = 0.0  # Submit-to-result time, including queueing
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def submit(self, fn, *args):
+        """Submit a job, or raise a 503 when the pool is saturated."""
+        executor = self._get_executor()
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication is busy, please retry shortly.",
+                    headers={"Retry-After": str(PASSWORD_POOL_RETRY_AFTER)},
+                )
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+        submitted_at = time.monotonic()
+        future = executor.submit(fn, *args)
+        future.add_done_callback(lambda _: self._finish(submitted_at))
+        return future
+
+    def _finish(self, submitted_at: float):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.job_seconds += time.monotonic() - submitted_at
+
+    def stats(self) -> dict:
+        """Return pool utilisation metrics."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "peak_in_flight": self.peak_in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "job_seconds": self.job_seconds,
+                "utilisation": min(self.in_flight, self.workers) / self.workers,
+            }
+
+
+password_pool = PasswordPool()
+
+
 def hash_password(password: str) -> str:
     """
     Hash a plaintext password.
+    Blocks the calling thread; use hash_password_async from `async def` code.
     """
-    return pwd_context.hash(password)
+    return password_pool.submit(_hash_password, password).result()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verify a plaintext password against a hashed password.
+    Blocks the calling thread; use verify_password_async from `async def` code.
+    """
+    return password_pool.submit(_verify_password, plain_password, hashed_password).result()
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a plaintext password on the password pool without blocking the event loop.
+    """
+    return await asyncio.wrap_future(password_pool.submit(_hash_password, password))
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a plaintext password on the password pool without blocking the event loop.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await asyncio.wrap_future(
+        password_pool.submit(_verify_password, plain_password, hashed_password)
+    )